@@ -0,0 +1,9 @@
+"""Offline benchmarks: drive Database and the cogs through fake Discord objects.
+
+Run from the repo root:
+
+    python -m benchmarks                # all workloads
+    python -m benchmarks --ops 5000     # more operations per workload
+    python -m benchmarks --only db      # workloads whose name starts with "db"
+    python -m benchmarks.simulate       # whole-event load simulation, see simulate.py
+"""
@@ -0,0 +1,26 @@
+import argparse
+import asyncio
+import logging
+
+from benchmarks.runner import HEADER, TempDatabase, measure
+from benchmarks.workloads import WORKLOADS
+
+async def main(ops: int, only: str = None):
+    print(HEADER)
+    for name, build in WORKLOADS.items():
+        if only and not name.startswith(only):
+            continue
+        async with TempDatabase() as db:
+            op, concurrency = await build(db, ops)
+            result = await measure(name, op, ops, concurrency)
+        print(result.row())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="HalloweenBot offline benchmarks")
+    parser.add_argument('--ops', type=int, default=500, help="operations per workload")
+    parser.add_argument('--only', help="run only workloads whose name starts with this")
+    args = parser.parse_args()
+    
+    # Game/admin log lines would dominate the output
+    logging.disable(logging.INFO)
+    asyncio.run(main(args.ops, args.only))
@@ -0,0 +1,104 @@
+"""Lightweight stand-ins for the discord.py objects the cogs touch, no network involved"""
+import os
+
+# The cogs read these at import time
+os.environ.setdefault('GUILD_IDS', '1')
+os.environ.setdefault('ADMIN_ROLE_ID', '1')
+
+import discord
+
+ADMIN_ROLE_ID = int(os.environ['ADMIN_ROLE_ID'])
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str = 'role', members=None):
+        self.id = role_id
+        self.name = name
+        self.members = members if members is not None else []
+
+class FakePermissions:
+    def __init__(self, administrator: bool):
+        self.administrator = administrator
+
+class FakeMember:
+    def __init__(self, user_id: int, admin: bool = False):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self.roles = [FakeRole(ADMIN_ROLE_ID, 'admin')] if admin else []
+        self.guild_permissions = FakePermissions(admin)
+
+class FakeGuild:
+    def __init__(self, guild_id: int, members=()):
+        self.id = guild_id
+        self.members = {member.id: member for member in members}
+        # Every member is cached, like a chunked guild with the default cache flags
+        self.chunked = True
+    
+    def get_member(self, user_id: int):
+        return self.members.get(user_id)
+
+class FakeMessage:
+    def __init__(self, author: FakeMember, guild: FakeGuild, content: str):
+        self.author = author
+        self.guild = guild
+        self.content = content
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+        self.sent = []
+    
+    def is_done(self) -> bool:
+        return self._done
+    
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.sent.append(('send', content, kwargs))
+    
+    async def edit_message(self, **kwargs):
+        self._done = True
+        self.sent.append(('edit', None, kwargs))
+    
+    async def defer(self, **kwargs):
+        self._done = True
+        self.sent.append(('defer', None, kwargs))
+
+class FakeFollowup:
+    def __init__(self, response: FakeResponse):
+        self.response = response
+    
+    async def send(self, content=None, **kwargs):
+        self.response.sent.append(('followup', content, kwargs))
+
+class FakeInteraction:
+    def __init__(self, client, user: FakeMember, guild: FakeGuild = None, component: bool = False):
+        self.client = client
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id if guild else None
+        self.command = None
+        self.extras = {}
+        self.created_at = discord.utils.utcnow()
+        self.type = discord.InteractionType.component if component else discord.InteractionType.application_command
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(self.response)
+    
+    async def edit_original_response(self, **kwargs):
+        self.response.sent.append(('edit_original', None, kwargs))
+    
+    async def delete_original_response(self):
+        self.response.sent.append(('delete_original', None, {}))
+
+class FakeBot:
+    """Just enough of commands.Bot for the cogs: .db and the dynamic item registry"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def add_dynamic_items(self, *items):
+        pass
+    
+    def remove_dynamic_items(self, *items):
+        pass
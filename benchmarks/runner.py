@@ -0,0 +1,64 @@
+import asyncio
+import contextlib
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import time
+
+from database import Database
+from perf import PerfRecorder
+
+class BenchResult:
+    def __init__(self, name: str, ops: int, elapsed: float, recorder: PerfRecorder):
+        self.name = name
+        self.ops = ops
+        self.elapsed = elapsed
+        _, self.p50, self.p95, self.p99, self.max = recorder.percentiles(name)
+    
+    @property
+    def ops_per_sec(self) -> float:
+        return self.ops / self.elapsed if self.elapsed else 0.0
+    
+    def row(self) -> str:
+        return (f"{self.name:<36} {self.ops:>7} {self.ops_per_sec:>10.0f} "
+                f"{self.p50 * 1000:>8.3f} {self.p95 * 1000:>8.3f} {self.p99 * 1000:>8.3f}")
+
+HEADER = f"{'workload':<36} {'ops':>7} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+
+async def measure(name: str, op, ops: int, concurrency: int = 1) -> BenchResult:
+    """Run op(i) for i in range(ops) across `concurrency` workers on this loop"""
+    recorder = PerfRecorder(window=ops)
+    counter = itertools.count()
+    
+    async def worker():
+        for i in counter:
+            if i >= ops:
+                return
+            with recorder.timer(name):
+                await op(i)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return BenchResult(name, ops, time.perf_counter() - start, recorder)
+
+class TempDatabase:
+    """Fresh Database on a throwaway SQLite file"""
+    
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.tmpdir = None
+        self.db = None
+    
+    async def __aenter__(self) -> Database:
+        self.tmpdir = tempfile.mkdtemp(prefix='halloweenbot-bench-')
+        self.db = Database(os.path.join(self.tmpdir, 'points.db'), **self.kwargs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Keep setup()'s "Database ready" line out of the results table
+            await self.db.setup()
+        return self.db
+    
+    async def __aexit__(self, *exc):
+        await self.db.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
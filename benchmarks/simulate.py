@@ -0,0 +1,202 @@
+"""Replay a synthetic Halloween event against the cogs on one asyncio loop.
+
+A fake gateway schedules every event as its own task, like discord.py's dispatch:
+members chat (message counter), admins run /point increase and /trickortreat, and
+invited users press the Play button. Arrivals are open-loop (Poisson), so when the
+bot can't keep up the backlog shows as event-loop lag instead of a slower producer.
+
+    python -m benchmarks.simulate --members 5000 --duration 60 --messages 400
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from benchmarks.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMember, FakeMessage
+from benchmarks.runner import TempDatabase
+from cogs.game import Game, TrickOrTreatButton
+from cogs.messagecounter import MessageCounter
+from cogs.points import Points
+from loopmonitor import LoopMonitor
+from perf import INTERACTION_DEADLINE, recorder
+
+BASE_ID = 100_000_000_000_000_000
+WORDS = "boo pumpkin candy ghost witch bat spooky treat trick moon cat broom".split()
+
+class TimedLock(asyncio.Lock):
+    """asyncio.Lock that records how long callers wait for it and how long it's held"""
+    
+    def __init__(self):
+        super().__init__()
+        self.acquired_at = None
+    
+    async def acquire(self):
+        recorder.incr("lock.acquire")
+        if self.locked():
+            recorder.incr("lock.contended")
+        start = time.perf_counter()
+        await super().acquire()
+        self.acquired_at = time.perf_counter()
+        recorder.record("lock.wait", self.acquired_at - start)
+        return True
+    
+    def release(self):
+        recorder.record("lock.hold", time.perf_counter() - self.acquired_at)
+        super().release()
+
+class FakeGateway:
+    """Runs each event handler as a separate task and times it end to end"""
+    
+    def __init__(self):
+        self.tasks = set()
+    
+    def dispatch(self, name: str, coro):
+        task = asyncio.create_task(self._run(name, coro))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+    
+    async def _run(self, name: str, coro):
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            recorder.incr(f"error.{name}")
+            logging.error(f"Simulated {name} failed: {e}")
+        elapsed = time.perf_counter() - start
+        recorder.record(f"event.{name}", elapsed)
+        if elapsed > INTERACTION_DEADLINE:
+            recorder.incr(f"over_deadline.{name}")
+    
+    async def drain(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+
+async def arrivals(rate: float, duration: float, fire):
+    """Call fire() at Poisson-distributed times for `duration` seconds"""
+    if rate <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    start = next_at = loop.time()
+    while True:
+        next_at += random.expovariate(rate)
+        if next_at - start >= duration:
+            return
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        fire()
+
+class Simulation:
+    def __init__(self, db, members: int, admins: int):
+        self.bot = FakeBot(db)
+        self.gateway = FakeGateway()
+        self.members = [FakeMember(BASE_ID + i) for i in range(members)]
+        self.admins = [FakeMember(i + 1, admin=True) for i in range(admins)]
+        self.guild = FakeGuild(1, self.members + self.admins)
+        
+        self.points = Points(self.bot)
+        self.game = Game(self.bot)
+        self.counter = MessageCounter(self.bot)
+        # custom_ids of Play buttons sent but not pressed yet, with the invited member
+        self.invites = []
+    
+    def chat(self):
+        member = random.choice(self.members)
+        content = " ".join(random.choices(WORDS, k=random.randint(1, 6)))
+        self.gateway.dispatch("message", self.counter.on_message(FakeMessage(member, self.guild, content)))
+    
+    def admin_command(self):
+        admin = random.choice(self.admins)
+        member = random.choice(self.members)
+        interaction = FakeInteraction(self.bot, admin, self.guild)
+        if random.random() < 0.5:
+            coro = Points.point.callback(self.points, interaction, "increase", member, random.randint(1, 5))
+            self.gateway.dispatch("cmd.point", coro)
+        else:
+            self.gateway.dispatch("cmd.trickortreat", self.trickortreat(interaction, member))
+    
+    async def trickortreat(self, interaction, member):
+        await Game.trickortreat.callback(self.game, interaction, member)
+        for _, _, kwargs in interaction.response.sent:
+            view = kwargs.get('view')
+            if view is not None:
+                # children[0] is Play, children[1] is Cancel
+                self.invites.append((view.children[0].custom_id, member))
+    
+    def press(self):
+        if not self.invites:
+            return
+        custom_id, member = self.invites.pop(random.randrange(len(self.invites)))
+        # Now and then someone else clicks first, which is rejected without touching the DB
+        presser = random.choice(self.members) if random.random() < 0.05 else member
+        self.gateway.dispatch("button.play", self.press_button(custom_id, presser))
+    
+    async def press_button(self, custom_id: str, presser: FakeMember):
+        interaction = FakeInteraction(self.bot, presser, self.guild, component=True)
+        match = TrickOrTreatButton.__discord_ui_compiled_template__.fullmatch(custom_id)
+        item = await TrickOrTreatButton.from_custom_id(interaction, None, match)
+        # Same order as discord.py's dispatch: the rate limit check runs first
+        if await item.interaction_check(interaction):
+            await item.callback(interaction)
+
+def report(elapsed: float, drain: float):
+    print(f"\nSimulated {elapsed:.1f}s, handlers drained {drain:.2f}s after the last arrival\n")
+    print(f"{'name':<28} {'count':>7} {'per s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for prefix in ("event.", "loop.", "lock.", "db."):
+        for name, count, p50, p95, p99, peak in sorted(row for row in recorder.summary() if row[0].startswith(prefix)):
+            print(f"{name[:28]:<28} {count:>7} {count / elapsed:>8.1f} {p50 * 1000:>8.2f} "
+                  f"{p95 * 1000:>8.2f} {p99 * 1000:>8.2f} {peak * 1000:>8.2f}")
+    
+    acquired = recorder.counters.get("lock.acquire", 0)
+    contended = recorder.counters.get("lock.contended", 0)
+    if acquired:
+        print(f"\nWrite lock: {acquired} acquisitions, {contended} ({contended / acquired:.0%}) had to wait")
+    for name, count in sorted(recorder.counters.items()):
+        if name.startswith(("error.", "over_deadline.")):
+            print(f"{name}: {count}")
+
+async def main(args):
+    random.seed(args.seed)
+    # Percentiles over the whole run rather than the last 1000 samples
+    recorder.window = 1_000_000
+    async with TempDatabase() as db:
+        sim = Simulation(db, args.members, args.admins)
+        # Everyone starts with a few points so invites can be sent and played
+        await db.add_points_many(sim.guild.id, {member.id: args.starting_points for member in sim.members})
+        
+        db.write_lock = TimedLock()
+        recorder.instrument(db, 'db')
+        await sim.counter.cog_load()
+        
+        # Same monitor as the bot: stalls also log the stack that blocked the loop
+        monitor = LoopMonitor(interval=0.05)
+        monitor.start()
+        start = time.perf_counter()
+        await asyncio.gather(
+            arrivals(args.messages, args.duration, sim.chat),
+            arrivals(args.commands, args.duration, sim.admin_command),
+            arrivals(args.presses, args.duration, sim.press),
+        )
+        arrived = time.perf_counter()
+        await sim.gateway.drain()
+        finished = time.perf_counter()
+        monitor.stop()
+        await sim.counter.cog_unload()
+    
+    report(finished - start, finished - arrived)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate a busy guild event against the cogs")
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--admins', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=30, help="seconds of arrivals")
+    parser.add_argument('--messages', type=float, default=200, help="chat messages per second")
+    parser.add_argument('--commands', type=float, default=5, help="admin commands per second")
+    parser.add_argument('--presses', type=float, default=20, help="Play button presses per second")
+    parser.add_argument('--starting-points', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    asyncio.run(main(args))
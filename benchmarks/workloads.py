@@ -0,0 +1,120 @@
+"""Each workload prepares state on a fresh Database and returns (op, concurrency)"""
+from benchmarks.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMember
+
+from cogs.freeplay import FreeplayButton
+from cogs.game import TrickOrTreatButton
+from cogs.points import Points
+from database import Admin
+
+# Users in the "many" workloads start here so IDs look like snowflakes
+BASE_ID = 100_000_000_000_000_000
+GUILD_ID = 1
+BENCH_ADMIN = Admin(0, "bench")
+
+# DATABASE
+async def db_get_points_hot(db, ops):
+    await db.add_points(GUILD_ID, BASE_ID, 10)
+    return (lambda i: db.get_points(GUILD_ID, BASE_ID)), 1
+
+async def db_get_points_many(db, ops):
+    await db.add_points_many(GUILD_ID, {BASE_ID + i: 10 for i in range(ops)})
+    # Start cold so reads hit SQLite
+    db.points_cache.clear()
+    return (lambda i: db.get_points(GUILD_ID, BASE_ID + i)), 1
+
+async def db_add_points_single(db, ops):
+    return (lambda i: db.add_points(GUILD_ID, BASE_ID, 1)), 1
+
+async def db_add_points_many(db, ops):
+    return (lambda i: db.add_points(GUILD_ID, BASE_ID + i, 1)), 50
+
+async def db_add_points_contended(db, ops):
+    return (lambda i: db.add_points(GUILD_ID, BASE_ID, 1)), 50
+
+async def db_increment_message_count(db, ops):
+    return (lambda i: db.increment_message_count(GUILD_ID, BASE_ID + i % 1000)), 50
+
+async def db_play_round_many(db, ops):
+    await db.add_points_many(GUILD_ID, {BASE_ID + i: 5 for i in range(ops)})
+    game_ids = [await db.create_pending_game(GUILD_ID, "tot", BASE_ID + i, BENCH_ADMIN) for i in range(ops)]
+    roll = lambda is_secret: ("trick", None)
+    return (lambda i: db.play_round(GUILD_ID, BASE_ID + i, 1, game_ids[i], roll)), 50
+
+# COGS
+def _points_command(db, user_for):
+    bot = FakeBot(db)
+    cog = Points(bot)
+    admin = FakeMember(1, admin=True)
+    guild = FakeGuild(GUILD_ID)
+    
+    async def op(i):
+        interaction = FakeInteraction(bot, admin, guild)
+        await Points.point.callback(cog, interaction, "increase", user_for(i), 1)
+    return op
+
+async def points_increase_single(db, ops):
+    member = FakeMember(BASE_ID)
+    return _points_command(db, lambda i: member), 1
+
+async def points_increase_many(db, ops):
+    members = [FakeMember(BASE_ID + i) for i in range(ops)]
+    return _points_command(db, lambda i: members[i]), 50
+
+async def points_increase_contended(db, ops):
+    member = FakeMember(BASE_ID)
+    return _points_command(db, lambda i: member), 50
+
+async def _invites(db, kind, user_for, ops):
+    return [await db.create_pending_game(GUILD_ID, kind, user_for(i), BENCH_ADMIN) for i in range(ops)]
+
+async def trickortreat_play_many(db, ops):
+    bot = FakeBot(db)
+    guild = FakeGuild(GUILD_ID)
+    await db.add_points_many(GUILD_ID, {BASE_ID + i: 5 for i in range(ops)})
+    game_ids = await _invites(db, "tot", lambda i: BASE_ID + i, ops)
+    members = [FakeMember(BASE_ID + i) for i in range(ops)]
+    
+    async def op(i):
+        button = TrickOrTreatButton("play", BASE_ID + i, game_ids[i], GUILD_ID)
+        await button.play_button(FakeInteraction(bot, members[i], guild, component=True))
+    return op, 50
+
+async def trickortreat_play_contended(db, ops):
+    # One user pressing many invites at once: every round serializes on the same balance
+    bot = FakeBot(db)
+    guild = FakeGuild(GUILD_ID)
+    await db.add_points(GUILD_ID, BASE_ID, ops)
+    game_ids = await _invites(db, "tot", lambda i: BASE_ID, ops)
+    member = FakeMember(BASE_ID)
+    
+    async def op(i):
+        button = TrickOrTreatButton("play", BASE_ID, game_ids[i], GUILD_ID)
+        await button.play_button(FakeInteraction(bot, member, guild, component=True))
+    return op, 50
+
+async def freeplay_play_many(db, ops):
+    bot = FakeBot(db)
+    guild = FakeGuild(GUILD_ID)
+    game_ids = await _invites(db, "free", lambda i: BASE_ID + i, ops)
+    members = [FakeMember(BASE_ID + i) for i in range(ops)]
+    
+    async def op(i):
+        button = FreeplayButton("play", BASE_ID + i, game_ids[i], GUILD_ID)
+        await button.play_button(FakeInteraction(bot, members[i], guild, component=True))
+    return op, 50
+
+WORKLOADS = {
+    "db.get_points.hot": db_get_points_hot,
+    "db.get_points.many": db_get_points_many,
+    "db.add_points.single": db_add_points_single,
+    "db.add_points.many": db_add_points_many,
+    "db.add_points.contended": db_add_points_contended,
+    "db.increment_message_count": db_increment_message_count,
+    "db.play_round.many": db_play_round_many,
+    "points.increase.single": points_increase_single,
+    "points.increase.many": points_increase_many,
+    "points.increase.contended": points_increase_contended,
+    "button.trickortreat.many": trickortreat_play_many,
+    "button.trickortreat.contended": trickortreat_play_contended,
+    "button.freeplay.many": freeplay_play_many,
+}
@@ -1,68 +1,203 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
+import asyncio
+import hashlib
+import json
 import os
+import signal
+import time
 from dotenv import load_dotenv
 from database import Database
+from config import GUILD_IDS, GUILDS, LEGACY_GUILD_ID, SHARD_COUNT, SHARD_IDS, LEAN_MEMBER_CACHE, owns_guild
+from logconfig import setup_logging
+from loopmonitor import loop_monitor
+from perf import recorder, INTERACTION_DEADLINE
+import ratelimit
 import logging
 
 load_dotenv()
 
 TOKEN = os.getenv('DISCORD_TOKEN')
-GUILD_ID = os.getenv('GUILD_ID')
 
 # Validate required environment variables
 if not TOKEN:
     raise ValueError("DISCORD_TOKEN environment variable is not set")
-if not GUILD_ID:
-    raise ValueError("GUILD_ID environment variable is not set")
-
-GUILD_ID = int(GUILD_ID)
-
-os.makedirs('logs', exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(asctime)s] %(message)s',
-    handlers=[
-        logging.FileHandler('logs/statistics.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+if not GUILD_IDS:
+    raise ValueError("GUILD_IDS (or GUILD_ID) environment variable is not set")
+if SHARD_IDS is not None and SHARD_COUNT is None:
+    raise ValueError("SHARD_IDS needs SHARD_COUNT")
+
+EXTENSIONS = ['cogs.points', 'cogs.game', 'cogs.freeplay', 'cogs.messagecounter', 'cogs.stats', 'cogs.perf', 'cogs.massinvite']
+
+# Hash of the last synced command tree per guild, so restarts skip the (rate limited) sync when nothing changed.
+# One file per shard range: processes sharing a directory would otherwise overwrite each other's hashes.
+COMMAND_HASH_FILE = os.getenv('COMMAND_HASH_FILE', '.command_tree_hash')
+if SHARD_IDS is not None:
+    COMMAND_HASH_FILE += '.' + '_'.join(map(str, SHARD_IDS))
+
+# Log writes happen on a background thread, never on the event loop
+log_listener = setup_logging()
 
 intents = discord.Intents.default()
+# Still needed in lean mode: member lookups and role member lists are requested over the gateway
 intents.members = True
 intents.message_content = True
 
-bot = commands.Bot(
+if LEAN_MEMBER_CACHE:
+    # Only the bot's own member is cached and guilds aren't chunked at startup
+    member_cache = dict(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+else:
+    member_cache = {}
+
+class PerfCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Runs before every app command: start its clock
+        interaction.extras['started'] = time.perf_counter()
+        if interaction.type != discord.InteractionType.application_command or interaction.command is None:
+            return True
+        # Shed bursts before they reach the handler (and the database)
+        return await ratelimit.allow_interaction(interaction, ratelimit.command_limiter, interaction.command.qualified_name)
+
+class HalloweenBot(commands.AutoShardedBot):
+    _shutdown = None
+    
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready which fires again on every reconnect
+        # Railway stops the worker with SIGTERM, which bot.run() doesn't handle: close properly
+        # so buffered message counts, ledger rows, grants and log records are written first
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.begin_shutdown)
+        except NotImplementedError:
+            pass  # Windows
+        # Lag stats show up in /perf as loop.lag, stalls are logged with the blocking stack
+        loop_monitor.start()
+        await self.db.setup()
+        
+        # One broken cog must not keep the others from loading
+        results = await asyncio.gather(*(self.load_extension(name) for name in EXTENSIONS), return_exceptions=True)
+        failed = [(name, result) for name, result in zip(EXTENSIONS, results) if isinstance(result, Exception)]
+        for name, error in failed:
+            print(f'❌ Cog loading error in {name}: {error}')
+            logging.error(f"Failed to load {name}", exc_info=error)
+        if failed:
+            # Syncing now would delete the failed cogs' commands from Discord
+            print('⚠️ Skipping command sync until all cogs load')
+            return
+        print('✅ All cogs loaded successfully')
+        
+        await sync_commands(self)
+    
+    def begin_shutdown(self) -> asyncio.Task:
+        """Start closing once, every later caller gets the same task"""
+        if self._shutdown is None:
+            self._shutdown = asyncio.create_task(self._close_all())
+        return self._shutdown
+    
+    async def _close_all(self):
+        # Stop the gateway first so no handler touches the DB while it closes
+        await super().close()
+        loop_monitor.stop()
+        await self.db.close()
+        log_listener.stop()
+    
+    async def close(self):
+        await asyncio.shield(self.begin_shutdown())
+    
+    async def __aexit__(self, *exc_info):
+        # discord.py only waits for its own part of close() here, which would let bot.run()
+        # cancel the DB flush once the gateway is down
+        await self.close()
+
+bot = HalloweenBot(
     command_prefix='!', 
     intents=intents,
-    heartbeat_timeout=60.0
+    heartbeat_timeout=60.0,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    tree_cls=PerfCommandTree,
+    **member_cache
 )
 
-bot.db = Database()
+# Prefix commands share the slash command limits
+bot.add_check(ratelimit.allow_command)
 
-@bot.event
-async def on_ready():
-    await bot.db.setup()
-    print(f'🎃 Bot {bot.user} is online!')
-    print(f'🎯 Guild ID: {GUILD_ID}')
+bot.db = Database(os.getenv('DB_PATH', 'points.db'), legacy_guild_id=LEGACY_GUILD_ID)
+# Every public Database coroutine shows up in /perf as db.<method>
+recorder.instrument(bot.db, 'db')
+
+def record_command(interaction: discord.Interaction, failed: bool = False):
+    started = interaction.extras.get('started')
+    if started is None:
+        return
     
-    try:
-        await bot.load_extension('cogs.points')
-        await bot.load_extension('cogs.game')
-        await bot.load_extension('cogs.freeplay')
-        await bot.load_extension('cogs.messagecounter')
-        print('✅ All cogs loaded successfully')
-    except Exception as e:
-        print(f'❌ Cog loading error: {e}')
+    name = interaction.command.qualified_name if interaction.command else 'unknown'
+    elapsed = time.perf_counter() - started
+    recorder.record(f"cmd.{name}", elapsed)
+    if elapsed > INTERACTION_DEADLINE:
+        recorder.incr(f"over_deadline.{name}")
+    if failed:
+        recorder.incr(f"error.{name}")
+
+def command_tree_hash(tree: app_commands.CommandTree, guild: discord.abc.Snowflake) -> str:
+    """Hash of exactly what tree.sync() would upload for this guild"""
+    payload = [command.to_dict(tree) for command in tree.get_commands(guild=guild)]
+    data = json.dumps({'app': tree.client.application_id, 'guild': guild.id, 'commands': payload}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+async def sync_guild(bot: commands.Bot, guild: discord.Object, synced_hashes: dict) -> str:
+    tree_hash = command_tree_hash(bot.tree, guild)
+    if synced_hashes.get(str(guild.id)) == tree_hash:
+        return 'unchanged'
     
     try:
-        synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
-        print(f'✅ Synced {len(synced)} commands to guild')
+        await bot.tree.sync(guild=guild)
     except Exception as e:
-        print(f'❌ Sync Error: {e}')
+        print(f'❌ Sync Error in guild {guild.id}: {e}')
+        return 'failed'
+    synced_hashes[str(guild.id)] = tree_hash
+    return 'synced'
+
+async def sync_commands(bot: commands.Bot):
+    """Sync the guilds on this process' shards whose commands changed since their last sync"""
+    try:
+        with open(COMMAND_HASH_FILE, encoding='utf-8') as f:
+            synced_hashes = json.load(f)
+    except (FileNotFoundError, ValueError):
+        synced_hashes = {}
+    
+    guilds = [guild for guild in GUILDS if owns_guild(guild.id)]
+    results = await asyncio.gather(*(sync_guild(bot, guild, synced_hashes) for guild in guilds))
+    print(f"✅ Commands synced to {results.count('synced')} guilds, {results.count('unchanged')} unchanged")
+    
+    if 'synced' in results:
+        with open(COMMAND_HASH_FILE, 'w', encoding='utf-8') as f:
+            json.dump(synced_hashes, f)
+
+@bot.event
+async def on_ready():
+    print(f'🎃 Bot {bot.user} is online!')
+    print(f'🎯 Guilds: {len(bot.guilds)} on shards {sorted(bot.shards)}')
+
+@bot.event
+async def on_shard_ready(shard_id: int):
+    print(f'🧩 Shard {shard_id} ready')
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    record_command(interaction)
+
+@bot.event
+async def on_command_error(ctx: commands.Context, error: commands.CommandError):
+    # Already answered by the check (or deliberately dropped)
+    if isinstance(error, ratelimit.RateLimited):
+        return
+    logging.error(f"Prefix command error: {error}", exc_info=error)
 
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
+    record_command(interaction, failed=True)
+    
     if isinstance(error, discord.app_commands.CommandInvokeError):
         original = error.original
         if isinstance(original, (discord.errors.HTTPException, ConnectionError)):
@@ -78,4 +213,5 @@ async def on_app_command_error(interaction: discord.Interaction, error: discord.
 
 if __name__ == '__main__':
     print("🚂 Starting bot for Railway deployment...")
-    bot.run(TOKEN)
+    # discord.py's own logs go through the root logger's queue instead of its default stream handler
+    bot.run(TOKEN, log_handler=None)
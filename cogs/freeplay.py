@@ -3,20 +3,13 @@ from discord import app_commands
 from discord.ext import commands
 import random
 import logging
-import os
-
-GUILD_ID = int(os.getenv('GUILD_ID'))
-
-# DISPLAY REWARDS (What players SEE)
-DISPLAY_REWARDS = {
-    "6 Tomatrio": "35%",
-    "2x Mango": "25%",
-    "2x 50-100k Damage (per 2 second)": "15%",
-    "3x Lucky Block": "12.5%",
-    "67": "7.5%",
-    "Owner Collection Payout": "4.5%",
-    "Secret Dragon Canneiloni (sab)": "0.5%"
-}
+import embeds
+import responses
+from responses import defer_when_slow
+from embeds import DISPLAY_REWARDS
+from config import GUILDS
+from database import Admin
+from views import InviteButton
 
 # ACTUAL FREEPLAY REWARDS (only 3 rewards)
 FREEPLAY_REWARDS = [
@@ -25,75 +18,47 @@ FREEPLAY_REWARDS = [
     ("2x 50-100k Damage (per 2 second)", 10.0)
 ]
 
-class FreeplayButton(discord.ui.View):
-    def __init__(self, target_user: discord.Member, admin: discord.Member, bot):
-        super().__init__(timeout=180)
-        self.target_user = target_user
-        self.admin = admin
-        self.bot = bot
-        self.played = False
+class FreeplayButton(InviteButton, prefix="free", play_label="Play Freeplay", play_style=discord.ButtonStyle.success):
+    """Freeplay invite: one free round per user"""
     
-    @discord.ui.button(label="Play Freeplay", style=discord.ButtonStyle.success)
-    async def play_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.target_user.id:
-            await interaction.response.send_message("This isn't for you!", ephemeral=True)
-            return
+    @defer_when_slow()
+    async def play_button(self, interaction: discord.Interaction):
+        user_name = interaction.user.name
         
-        if self.played:
-            await interaction.response.send_message("You already played!", ephemeral=True)
+        # Invite, one-time claim, roll and ledger entry all happen in one transaction
+        result = await interaction.client.db.play_freeplay(self.guild_id, self.user_id, self.game_id, self.get_freeplay_reward)
+        if result.status == "used":
+            await responses.send(interaction, "You already played!", ephemeral=True)
             return
         
-        has_claimed = await self.bot.db.has_claimed_freeplay(self.target_user.id)
-        if has_claimed:
+        admin_name = result.admin_name
+        if result.status == "claimed":
             embed = discord.Embed(
                 title="Already Claimed!",
                 description="You have already claimed your freeplay! You can only claim it once.",
                 color=discord.Color.red()
             )
-            try:
-                await interaction.response.edit_message(embed=embed, view=None)
-            except:
-                await interaction.followup.send(embed=embed)
+            await responses.edit(interaction, embed=embed)
             
-            logging.info(f"FREEPLAY BLOCKED: {self.target_user.name} already claimed (Admin: {self.admin.name})")
+            logging.info(f"FREEPLAY BLOCKED: {user_name} already claimed (Admin: {admin_name})")
             return
         
-        self.played = True
-        await self.bot.db.mark_freeplay_claimed(self.target_user.id)
-        
-        reward_name = self.get_freeplay_reward()
+        reward_name = result.reward
         display_percentage = DISPLAY_REWARDS[reward_name]
         
-        embed = discord.Embed(
-            title="🎁 Freeplay Gift!",
-            description=f"Congratulations! You won the **{display_percentage}** reward: **{reward_name}**!",
-            color=discord.Color.gold()
-        )
-        embed.set_footer(text="No points were used for this game!")
+        embed = embeds.reward_won("🎁 Freeplay Gift!", reward_name, discord.Color.gold(), "No points were used for this game!", prefix="Congratulations! You won")
         
-        logging.info(f"FREEPLAY: {self.target_user.name} -> {reward_name} (Shown: {display_percentage}, Admin: {self.admin.name})")
+        logging.info(f"FREEPLAY: {user_name} -> {reward_name} (Shown: {display_percentage}, Admin: {admin_name})")
         
-        try:
-            await interaction.response.edit_message(embed=embed, view=None)
-        except:
-            await interaction.followup.send(embed=embed)
+        await responses.edit(interaction, embed=embed)
     
-    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
-    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.target_user.id:
-            await interaction.response.send_message("This isn't for you!", ephemeral=True)
-            return
+    async def cancel_button(self, interaction: discord.Interaction):
+        # Drop the invite so it can't be played afterwards
+        await interaction.client.db.claim_pending_game(self.guild_id, self.game_id, self.user_id)
         
-        embed = discord.Embed(
-            title="Cancelled",
-            description="Freeplay cancelled.",
-            color=discord.Color.greyple()
-        )
+        embed = embeds.cancelled("Freeplay cancelled.")
         
-        try:
-            await interaction.response.edit_message(embed=embed, view=None)
-        except:
-            await interaction.followup.send(embed=embed)
+        await responses.edit(interaction, embed=embed)
     
     def get_freeplay_reward(self):
         names, weights = zip(*FREEPLAY_REWARDS)
@@ -105,6 +70,12 @@ class Freeplay(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
     
+    async def cog_load(self):
+        self.bot.add_dynamic_items(FreeplayButton)
+    
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(FreeplayButton)
+    
     def has_admin_perms(self, interaction: discord.Interaction) -> bool:
         return interaction.user.guild_permissions.administrator
     
@@ -112,55 +83,48 @@ class Freeplay(commands.Cog):
         return self.has_admin_perms(interaction)
     
     @app_commands.command(name="freeplay", description="Send a free Trick or Treat (one-time only)")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.guilds(*GUILDS)
     @app_commands.describe(user="User to send freeplay to")
+    @defer_when_slow()
     async def freeplay(self, interaction: discord.Interaction, user: discord.Member):
         if not self.has_admin_perms(interaction):
-            await interaction.response.send_message("You don't have permission!", ephemeral=True)
+            await responses.send(interaction, "You don't have permission!", ephemeral=True)
             return
         
-        has_claimed = await self.bot.db.has_claimed_freeplay(user.id)
+        has_claimed = await self.bot.db.has_claimed_freeplay(interaction.guild_id, user.id)
         if has_claimed:
-            await interaction.response.send_message(
+            await responses.send(
+                interaction,
                 f"❌ {user.mention} has already claimed their freeplay!\n\nUse `/resetfreeplay @{user.name}` to reset.",
                 ephemeral=True
             )
             return
         
-        rewards_text = "\n".join([f"• **{reward}** - {percent}" for reward, percent in DISPLAY_REWARDS.items()])
-        
-        embed = discord.Embed(
-            title="🎁 Free Gift Time!",
-            description=f"{user.mention}, you've received a **FREE** Trick or Treat!\n\n⚠️ **This is a ONE-TIME offer!**",
-            color=discord.Color.gold()
-        )
-        embed.add_field(name="🎁 Possible Rewards", value=rewards_text, inline=False)
-        embed.add_field(name="How to Play", value="Press **Play Freeplay** or **Cancel**.\n\n**Note:** You can only claim this once!", inline=False)
-        embed.set_footer(text="No points required!")
+        embed = embeds.freeplay_invite(user)
         
-        view = FreeplayButton(user, interaction.user, self.bot)
+        game_id = await self.bot.db.create_pending_game(interaction.guild_id, "free", user.id, Admin.of(interaction.user))
+        view = FreeplayButton.view(user.id, game_id)
         
-        try:
-            await interaction.response.send_message(embed=embed, view=view)
-            logging.info(f"ADMIN: {interaction.user.name} sent Freeplay to {user.name}")
-        except:
-            await interaction.followup.send(embed=embed, view=view)
+        await responses.send(interaction, embed=embed, view=view)
+        logging.info(f"ADMIN: {interaction.user.name} sent Freeplay to {user.name}")
     
     @app_commands.command(name="resetfreeplay", description="Reset freeplay claim")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.guilds(*GUILDS)
     @app_commands.describe(user="User to reset (blank = reset ALL)")
     async def resetfreeplay(self, interaction: discord.Interaction, user: discord.Member = None):
         if not self.has_admin_perms(interaction):
-            await interaction.response.send_message("You don't have permission!", ephemeral=True)
+            await responses.send(interaction, "You don't have permission!", ephemeral=True)
             return
         
         if user is None:
-            await self.bot.db.reset_all_freeplays()
-            await interaction.response.send_message("✅ Reset ALL freeplay claims!", ephemeral=True)
+            await self.bot.db.reset_all_freeplays(interaction.guild_id)
+            self.bot.db.record(interaction.guild_id, "freeplay_reset_all", admin=Admin.of(interaction.user))
+            await responses.send(interaction, "✅ Reset ALL freeplay claims!", ephemeral=True)
             logging.info(f"ADMIN: {interaction.user.name} reset ALL freeplays")
         else:
-            await self.bot.db.reset_freeplay(user.id)
-            await interaction.response.send_message(f"✅ Reset freeplay for {user.mention}!", ephemeral=True)
+            await self.bot.db.reset_freeplay(interaction.guild_id, user.id)
+            self.bot.db.record(interaction.guild_id, "freeplay_reset", user.id, admin=Admin.of(interaction.user))
+            await responses.send(interaction, f"✅ Reset freeplay for {user.mention}!", ephemeral=True)
             logging.info(f"ADMIN: {interaction.user.name} reset freeplay for {user.name}")
 
 async def setup(bot):
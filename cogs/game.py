@@ -3,20 +3,13 @@ from discord import app_commands
 from discord.ext import commands
 import random
 import logging
-import os
-
-GUILD_ID = int(os.getenv('GUILD_ID'))
-
-# DISPLAY REWARDS (What players SEE)
-DISPLAY_REWARDS = {
-    "6 Tomatrio": "35%",
-    "2x Mango": "25%",
-    "2x 50-100k Damage (per 2 second)": "15%",
-    "3x Lucky Block": "12.5%",
-    "67": "7.5%",
-    "Owner Collection Payout": "4.5%",
-    "Secret Dragon Canneiloni (sab)": "0.5%"
-}
+import embeds
+import responses
+from responses import defer_when_slow
+from embeds import DISPLAY_REWARDS
+from config import GUILDS
+from database import Admin
+from views import InviteButton
 
 # ACTUAL REWARDS (RIGGED - What they really get)
 ACTUAL_REWARDS = [
@@ -28,104 +21,62 @@ ACTUAL_REWARDS = [
     ("Owner Collection Payout", 1.0)
 ]
 
-class TrickOrTreatButton(discord.ui.View):
-    def __init__(self, target_user: discord.Member, admin: discord.Member, bot, is_secret: bool = False):
-        super().__init__(timeout=180)
-        self.target_user = target_user
-        self.admin = admin
-        self.bot = bot
-        self.is_secret = is_secret
-        self.played = False
+# Always won from a !secretdragon invite
+SECRET_REWARD = "Secret Dragon Canneiloni (sab)"
+
+class TrickOrTreatButton(InviteButton, prefix="tot", play_label="Trick or Treat", play_style=discord.ButtonStyle.primary):
+    """Trick or Treat invite: play costs a point"""
     
-    @discord.ui.button(label="Trick or Treat", style=discord.ButtonStyle.primary)
-    async def play_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.target_user.id:
-            await interaction.response.send_message("This isn't for you!", ephemeral=True)
+    @defer_when_slow()
+    async def play_button(self, interaction: discord.Interaction):
+        # Invite check, debit, roll and round record all happen in one transaction
+        result = await interaction.client.db.play_round(self.guild_id, self.user_id, 1, self.game_id, self.roll)
+        if result.status == "used":
+            await responses.send(interaction, "You already played!", ephemeral=True)
             return
         
-        if self.played:
-            await interaction.response.send_message("You already played!", ephemeral=True)
+        if result.status == "insufficient":
+            await responses.send(interaction, "You don't have enough points!", ephemeral=True)
             return
         
-        self.played = True
+        user_name = interaction.user.name
+        new_points = result.points
         
-        points = await self.bot.db.get_points(self.target_user.id)
-        if points < 1:
-            await interaction.response.send_message("You don't have enough points!", ephemeral=True)
-            return
-        
-        await self.bot.db.remove_points(self.target_user.id, 1)
-        new_points = await self.bot.db.get_points(self.target_user.id)
-        
-        if self.is_secret:
-            reward_name = "Secret Dragon Canneiloni (sab)"
-            display_percentage = DISPLAY_REWARDS[reward_name]
-            
-            embed = discord.Embed(
-                title="🎉 JACKPOT! 🎉",
-                description=f"You won the **{display_percentage}** reward: **{reward_name}**!",
-                color=discord.Color.gold()
-            )
-            embed.set_footer(text=f"Points remaining: {new_points}")
+        if result.outcome == "jackpot":
+            embed = embeds.reward_won("🎉 JACKPOT! 🎉", result.reward, discord.Color.gold(), f"Points remaining: {new_points}")
             
-            logging.info(f"SECRET: {self.target_user.name} won SECRET Dragon Canneiloni (Admin: {self.admin.name})")
-            
-            try:
-                await interaction.response.edit_message(embed=embed, view=None)
-            except:
-                await interaction.followup.send(embed=embed)
-            return
+            logging.info(f"SECRET: {user_name} won SECRET Dragon Canneiloni (Admin: {result.admin_name})")
         
-        is_treat = random.random() < 0.49
-        
-        if not is_treat:
-            embed = discord.Embed(
-                title="👻 Oops...",
-                description="Sorry, you got **tricked**! So sorry for trick goodluck for next time!",
-                color=discord.Color.red()
-            )
-            embed.set_footer(text=f"Points remaining: {new_points}")
-            
-            logging.info(f"USER: {self.target_user.name} -> TRICK (Admin: {self.admin.name})")
+        elif result.outcome == "trick":
+            embed = embeds.tricked(new_points)
             
-            try:
-                await interaction.response.edit_message(embed=embed, view=None)
-            except:
-                await interaction.followup.send(embed=embed)
+            logging.info(f"USER: {user_name} -> TRICK (Admin: {result.admin_name})")
+        
         else:
-            reward_name = self.get_rigged_reward()
-            display_percentage = DISPLAY_REWARDS[reward_name]
+            display_percentage = DISPLAY_REWARDS[result.reward]
             
-            embed = discord.Embed(
-                title="🎃 Congratulations!",
-                description=f"You won the **{display_percentage}** reward: **{reward_name}**!",
-                color=discord.Color.green()
-            )
-            embed.set_footer(text=f"Points remaining: {new_points}")
+            embed = embeds.reward_won("🎃 Congratulations!", result.reward, discord.Color.green(), f"Points remaining: {new_points}")
             
-            logging.info(f"USER: {self.target_user.name} -> TREAT: {reward_name} (Shown: {display_percentage}, Admin: {self.admin.name})")
-            
-            try:
-                await interaction.response.edit_message(embed=embed, view=None)
-            except:
-                await interaction.followup.send(embed=embed)
+            logging.info(f"USER: {user_name} -> TREAT: {result.reward} (Shown: {display_percentage}, Admin: {result.admin_name})")
+        
+        await responses.edit(interaction, embed=embed)
     
-    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
-    async def cancel_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.target_user.id:
-            await interaction.response.send_message("This isn't for you!", ephemeral=True)
-            return
+    def roll(self, is_secret: bool):
+        """(outcome, reward) for one round, called by Database.play_round"""
+        if is_secret:
+            return "jackpot", SECRET_REWARD
+        
+        if random.random() < 0.49:
+            return "treat", self.get_rigged_reward()
+        return "trick", None
+    
+    async def cancel_button(self, interaction: discord.Interaction):
+        # Drop the invite so the game can't be played afterwards
+        await interaction.client.db.claim_pending_game(self.guild_id, self.game_id, self.user_id)
         
-        embed = discord.Embed(
-            title="Cancelled",
-            description="Game cancelled. No points were used.",
-            color=discord.Color.greyple()
-        )
+        embed = embeds.cancelled("Game cancelled. No points were used.")
         
-        try:
-            await interaction.response.edit_message(embed=embed, view=None)
-        except:
-            await interaction.followup.send(embed=embed)
+        await responses.edit(interaction, embed=embed)
     
     def get_rigged_reward(self):
         names, weights = zip(*ACTUAL_REWARDS)
@@ -137,6 +88,13 @@ class Game(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
     
+    async def cog_load(self):
+        # Buttons of invites sent before a restart keep working
+        self.bot.add_dynamic_items(TrickOrTreatButton)
+    
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(TrickOrTreatButton)
+    
     def has_admin_perms(self, interaction: discord.Interaction) -> bool:
         return interaction.user.guild_permissions.administrator
     
@@ -144,40 +102,31 @@ class Game(commands.Cog):
         return self.has_admin_perms(interaction)
     
     @app_commands.command(name="trickortreat", description="Send Trick or Treat game (Admin Only)")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.guilds(*GUILDS)
     @app_commands.describe(user="User to send the game to")
+    @defer_when_slow()
     async def trickortreat(self, interaction: discord.Interaction, user: discord.Member = None):
         if not self.has_admin_perms(interaction):
-            await interaction.response.send_message("You don't have permission!", ephemeral=True)
+            await responses.send(interaction, "You don't have permission!", ephemeral=True)
             return
         
         if user is None:
             user = interaction.user
         
-        points = await self.bot.db.get_points(user.id)
+        points = await self.bot.db.get_points(interaction.guild_id, user.id)
         if points < 1:
-            await interaction.response.send_message(f"{user.mention} doesn't have enough points! (Current: {points})", ephemeral=True)
+            await responses.send(interaction, f"{user.mention} doesn't have enough points! (Current: {points})", ephemeral=True)
             return
         
         is_secret = False
         
-        rewards_text = "\n".join([f"• **{reward}** - {percent}" for reward, percent in DISPLAY_REWARDS.items()])
+        embed = embeds.trickortreat_invite(user, points)
         
-        embed = discord.Embed(
-            title="🎃 Trick or Treat Time!",
-            description=f"{user.mention}, you've been invited to play!\n\n**Cost:** 1 point\n**Your points:** {points}",
-            color=discord.Color.orange()
-        )
-        embed.add_field(name="🎁 Possible Rewards", value=rewards_text, inline=False)
-        embed.add_field(name="How to Play", value="Press **Trick or Treat** to play or **Cancel** to skip.", inline=False)
+        game_id = await self.bot.db.create_pending_game(interaction.guild_id, "tot", user.id, Admin.of(interaction.user), is_secret)
+        view = TrickOrTreatButton.view(user.id, game_id)
         
-        view = TrickOrTreatButton(user, interaction.user, self.bot, is_secret)
-        
-        try:
-            await interaction.response.send_message(embed=embed, view=view)
-            logging.info(f"ADMIN: {interaction.user.name} sent Trick or Treat to {user.name}")
-        except:
-            await interaction.followup.send(embed=embed, view=view)
+        await responses.send(interaction, embed=embed, view=view)
+        logging.info(f"ADMIN: {interaction.user.name} sent Trick or Treat to {user.name}")
     
     @commands.command(name="secretdragon")
     async def secretdragon_msg(self, ctx, user: discord.Member):
@@ -186,7 +135,7 @@ class Game(commands.Cog):
             await ctx.message.delete()
             return
         
-        points = await self.bot.db.get_points(user.id)
+        points = await self.bot.db.get_points(ctx.guild.id, user.id)
         if points < 1:
             await ctx.send(f"{user.mention} doesn't have enough points!", delete_after=5)
             await ctx.message.delete()
@@ -196,17 +145,10 @@ class Game(commands.Cog):
         
         is_secret = True
         
-        rewards_text = "\n".join([f"• **{reward}** - {percent}" for reward, percent in DISPLAY_REWARDS.items()])
-        
-        embed = discord.Embed(
-            title="🎃 Trick or Treat Time!",
-            description=f"{user.mention}, you've been invited to play!\n\n**Cost:** 1 point\n**Your points:** {points}",
-            color=discord.Color.orange()
-        )
-        embed.add_field(name="🎁 Possible Rewards", value=rewards_text, inline=False)
-        embed.add_field(name="How to Play", value="Press **Trick or Treat** to play or **Cancel** to skip.", inline=False)
+        embed = embeds.trickortreat_invite(user, points)
         
-        view = TrickOrTreatButton(user, ctx.author, self.bot, is_secret)
+        game_id = await self.bot.db.create_pending_game(ctx.guild.id, "tot", user.id, Admin.of(ctx.author), is_secret)
+        view = TrickOrTreatButton.view(user.id, game_id)
         
         await ctx.send(embed=embed, view=view)
         logging.info(f"SECRET: {ctx.author.name} activated SECRET DRAGON for {user.name}")
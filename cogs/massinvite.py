@@ -0,0 +1,149 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+import logging
+import os
+import time
+import embeds
+from cogs.game import TrickOrTreatButton
+from cogs.freeplay import FreeplayButton
+from ratelimit import TokenBucketLimiter, parse_rate
+from membernames import role_members
+from config import GUILDS
+from database import Admin
+
+# Invites in flight at once, and overall DMs per second (each DM can cost two requests
+# when its channel isn't open yet, so 20/1 stays below Discord's global 50 requests/s)
+MASS_INVITE_CONCURRENCY = int(os.getenv('MASS_INVITE_CONCURRENCY', '10'))
+dm_limiter = TokenBucketLimiter(*parse_rate(os.getenv('MASS_INVITE_RATE', '20/1')))
+
+# Seconds between progress edits of the command's response
+PROGRESS_INTERVAL = 2.0
+
+GAMES = {
+    "trickortreat": ("tot", TrickOrTreatButton, "Trick or Treat"),
+    "freeplay": ("free", FreeplayButton, "Freeplay"),
+}
+
+def mention_list(user_ids, limit: int = 1000) -> str:
+    """Mentions joined up to `limit` characters (embed fields hold 1024)"""
+    text = ""
+    for count, user_id in enumerate(user_ids):
+        mention = f"<@{user_id}> "
+        if len(text) + len(mention) > limit:
+            return text + f"and {len(user_ids) - count} more"
+        text += mention
+    return text
+
+class MassInvite(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+    
+    def has_admin_perms(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.guild_permissions.administrator
+    
+    def progress_embed(self, role: discord.Role, label: str, total: int, sent: int, skipped: dict, done: bool) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"📨 {label} invites for {role.name}" + (" - done" if done else ""),
+            description=f"**{sent}** / {total} sent",
+            color=discord.Color.green() if done else discord.Color.orange()
+        )
+        for reason, user_ids in skipped.items():
+            if user_ids:
+                embed.add_field(name=f"Skipped: {reason} ({len(user_ids)})", value=mention_list(user_ids), inline=False)
+        return embed
+    
+    async def send_invite(self, guild: discord.Guild, member: discord.Member, kind: str, button, game_id: int, points: int):
+        if kind == "tot":
+            embed = embeds.trickortreat_invite(member, points)
+        else:
+            embed = embeds.freeplay_invite(member)
+        # Tells the member which server the DM is from
+        embed.set_author(name=guild.name)
+        await dm_limiter.acquire("dm")
+        await member.send(embed=embed, view=button.view(member.id, game_id, guild.id))
+    
+    @app_commands.command(name="massinvite", description="Send an invite to everyone with a role by DM (Admin Only)")
+    @app_commands.guilds(*GUILDS)
+    @app_commands.describe(
+        role="Everyone with this role",
+        game="Choose game: trickortreat, freeplay"
+    )
+    async def massinvite(self, interaction: discord.Interaction, role: discord.Role, game: str):
+        if not self.has_admin_perms(interaction):
+            await interaction.response.send_message("You don't have permission!", ephemeral=True)
+            return
+        
+        game = game.lower()
+        if game not in GAMES:
+            await interaction.response.send_message("Invalid game! Use: trickortreat or freeplay", ephemeral=True)
+            return
+        kind, button, label = GAMES[game]
+        
+        # Always slower than Discord's 3 seconds: progress goes into the deferred response
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        guild = interaction.guild
+        db = self.bot.db
+        
+        members = [member for member in await role_members(guild, role) if not member.bot]
+        # One query for every balance and claim flag instead of one per member
+        states = await db.get_user_states(guild.id, [member.id for member in members])
+        
+        skipped = {"not enough points": [], "already claimed": [], "DMs closed": [], "send failed": []}
+        eligible = []
+        for member in members:
+            points, _, claimed = states[member.id]
+            if kind == "tot" and points < 1:
+                skipped["not enough points"].append(member.id)
+            elif kind == "free" and claimed:
+                skipped["already claimed"].append(member.id)
+            else:
+                eligible.append(member)
+        
+        game_ids = await db.create_pending_games(guild.id, kind, [member.id for member in eligible], Admin.of(interaction.user))
+        
+        queue = asyncio.Queue()
+        for member in eligible:
+            queue.put_nowait(member)
+        sent = 0
+        
+        async def sender():
+            nonlocal sent
+            while not queue.empty():
+                member = queue.get_nowait()
+                try:
+                    await self.send_invite(guild, member, kind, button, game_ids[member.id], states[member.id][0])
+                    sent += 1
+                    continue
+                except discord.Forbidden:
+                    skipped["DMs closed"].append(member.id)
+                except (discord.errors.HTTPException, ConnectionError) as e:
+                    logging.error(f"Failed to send {game} invite to {member.id}: {e}")
+                    skipped["send failed"].append(member.id)
+                # Nobody can press an invite that never arrived
+                await db.claim_pending_game(guild.id, game_ids[member.id], member.id)
+        
+        async def report(done: bool = False):
+            embed = self.progress_embed(role, label, len(members), sent, skipped, done)
+            try:
+                await interaction.edit_original_response(embed=embed)
+            except (discord.errors.HTTPException, ConnectionError) as e:
+                logging.error(f"Failed to update invite progress: {e}")
+        
+        started = time.perf_counter()
+        senders = asyncio.gather(*(sender() for _ in range(min(MASS_INVITE_CONCURRENCY, len(eligible)))))
+        while not senders.done():
+            await report()
+            await asyncio.wait([senders], timeout=PROGRESS_INTERVAL)
+        await senders
+        await report(done=True)
+        
+        skipped_count = sum(len(user_ids) for user_ids in skipped.values())
+        logging.info(
+            f"ADMIN: {interaction.user.name} sent {game} to {sent} members of {role.name} "
+            f"({skipped_count} skipped, {time.perf_counter() - started:.1f}s)"
+        )
+
+async def setup(bot):
+    await bot.add_cog(MassInvite(bot))
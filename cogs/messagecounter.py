@@ -0,0 +1,132 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import logging
+import os
+import time
+import responses
+from responses import defer_when_slow
+from config import GUILD_IDS, GUILDS
+from membernames import MemberNameCache
+from views import LEADERBOARD_PAGE_SIZE, LeaderboardView, build_leaderboard_embed
+
+# Every MESSAGES_PER_POINT counted messages earn POINTS_PER_REWARD points
+MESSAGES_PER_POINT = int(os.getenv('MESSAGES_PER_POINT', '50'))
+POINTS_PER_REWARD = int(os.getenv('POINTS_PER_REWARD', '1'))
+
+# Messages sent within MESSAGE_COOLDOWN seconds of the last counted one are ignored
+MESSAGE_COOLDOWN = float(os.getenv('MESSAGE_COOLDOWN', '3'))
+# Repeating the previous message within DUPLICATE_WINDOW seconds doesn't count either
+DUPLICATE_WINDOW = float(os.getenv('DUPLICATE_WINDOW', '60'))
+
+# How often earned points are written to the database
+GRANT_FLUSH_INTERVAL = float(os.getenv('GRANT_FLUSH_INTERVAL', '10'))
+
+class MessageCounter(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # (guild_id, user_id) -> (monotonic time of last counted message, hash of its content)
+        self.last_message = {}
+        # guild_id -> {user_id: points earned but not written yet}
+        self.pending_grants = {}
+        self.guild_ids = set(GUILD_IDS)
+        self.member_names = MemberNameCache()
+    
+    async def cog_load(self):
+        self.flush_grants.change_interval(seconds=GRANT_FLUSH_INTERVAL)
+        self.flush_grants.start()
+    
+    async def cog_unload(self):
+        self.flush_grants.cancel()
+        await self.write_grants()
+    
+    def is_spam(self, message: discord.Message, now: float) -> bool:
+        """Cooldown and repeated-content check, updates the user's window"""
+        key = (message.guild.id, message.author.id)
+        content_hash = hash(message.content)
+        last = self.last_message.get(key)
+        if last is not None:
+            last_time, last_hash = last
+            if now - last_time < MESSAGE_COOLDOWN:
+                return True
+            if content_hash == last_hash and now - last_time < DUPLICATE_WINDOW:
+                return True
+        
+        self.last_message[key] = (now, content_hash)
+        return False
+    
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.author.bot or message.guild is None or message.guild.id not in self.guild_ids:
+            return
+        
+        if self.is_spam(message, time.monotonic()):
+            return
+        
+        guild_id, user_id = message.guild.id, message.author.id
+        count = await self.bot.db.increment_message_count(guild_id, user_id)
+        if count % MESSAGES_PER_POINT == 0:
+            grants = self.pending_grants.setdefault(guild_id, {})
+            grants[user_id] = grants.get(user_id, 0) + POINTS_PER_REWARD
+    
+    async def write_grants(self):
+        if not self.pending_grants:
+            return
+        
+        pending, self.pending_grants = self.pending_grants, {}
+        error = None
+        # One transaction per guild, a failing guild doesn't hold up the others
+        for guild_id, grants in pending.items():
+            try:
+                await self.bot.db.add_points_many(guild_id, grants, "message_reward")
+            except Exception as e:
+                # Keep the points for the next flush
+                retry = self.pending_grants.setdefault(guild_id, {})
+                for user_id, amount in grants.items():
+                    retry[user_id] = retry.get(user_id, 0) + amount
+                error = e
+                continue
+            
+            logging.info(f"AUTO: granted {sum(grants.values())} message points to {len(grants)} users in {guild_id}")
+        
+        if error is not None:
+            raise error
+    
+    async def leaderboard_page(self, guild: discord.Guild, page: int):
+        """Rendered message leaderboard page and whether a next page exists (None if the page is empty)"""
+        # Fetch one extra row to know whether a next page exists
+        rows = await self.bot.db.get_message_leaderboard(guild.id, LEADERBOARD_PAGE_SIZE + 1, page * LEADERBOARD_PAGE_SIZE)
+        if not rows:
+            return None, False
+        
+        names = await self.member_names.resolve(guild, [user_id for user_id, _ in rows[:LEADERBOARD_PAGE_SIZE]])
+        embed = build_leaderboard_embed("💬 Most Messages", rows[:LEADERBOARD_PAGE_SIZE], names, page, "messages")
+        return embed, len(rows) > LEADERBOARD_PAGE_SIZE
+    
+    @app_commands.command(name="messages", description="Who sent the most messages")
+    @app_commands.guilds(*GUILDS)
+    @defer_when_slow()
+    async def messages(self, interaction: discord.Interaction):
+        embed, has_next = await self.leaderboard_page(interaction.guild, 0)
+        if embed is None:
+            await responses.send(interaction, "No messages counted yet.", ephemeral=True)
+            return
+        
+        view = LeaderboardView(self.leaderboard_page, interaction.user, has_next)
+        await responses.send(interaction, embed=embed, view=view)
+    
+    @tasks.loop(seconds=10)
+    async def flush_grants(self):
+        try:
+            await self.write_grants()
+        except Exception as e:
+            logging.error(f"Message point grant failed: {e}")
+        
+        # Forget users whose spam windows have passed so the map stays small
+        cutoff = time.monotonic() - max(MESSAGE_COOLDOWN, DUPLICATE_WINDOW)
+        self.last_message = {
+            user_id: last for user_id, last in self.last_message.items() if last[0] >= cutoff
+        }
+
+async def setup(bot):
+    await bot.add_cog(MessageCounter(bot))
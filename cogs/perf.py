@@ -0,0 +1,82 @@
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+import asyncio
+import logging
+import os
+from perf import recorder
+from loopmonitor import loop_monitor
+from config import GUILDS
+
+# Optional Prometheus text-format dump (e.g. for node_exporter's textfile collector)
+PERF_PROM_FILE = os.getenv('PERF_PROM_FILE')
+PERF_DUMP_INTERVAL = float(os.getenv('PERF_DUMP_INTERVAL', '15'))
+
+def write_file(path: str, text: str):
+    # Write then rename so a scraper never reads a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+class Perf(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+    
+    async def cog_load(self):
+        if PERF_PROM_FILE:
+            self.dump_metrics.change_interval(seconds=PERF_DUMP_INTERVAL)
+            self.dump_metrics.start()
+    
+    async def cog_unload(self):
+        self.dump_metrics.cancel()
+    
+    def has_admin_perms(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.guild_permissions.administrator
+    
+    @tasks.loop(seconds=15)
+    async def dump_metrics(self):
+        try:
+            await asyncio.to_thread(write_file, PERF_PROM_FILE, recorder.prometheus_text())
+        except Exception as e:
+            logging.error(f"Metrics dump failed: {e}")
+    
+    @app_commands.command(name="perf", description="Command and database latency (Admin Only)")
+    @app_commands.guilds(*GUILDS)
+    @app_commands.describe(match="Only show names containing this text (e.g. db, cmd, button)")
+    async def perf(self, interaction: discord.Interaction, match: str = None):
+        if not self.has_admin_perms(interaction):
+            await interaction.response.send_message("You don't have permission!", ephemeral=True)
+            return
+        
+        rows = [row for row in recorder.summary() if not match or match in row[0]][:20]
+        if not rows:
+            await interaction.response.send_message("No timings recorded yet.", ephemeral=True)
+            return
+        
+        lines = [f"{'name':<32} {'count':>6} {'p50':>7} {'p95':>7} {'p99':>7}"]
+        for name, count, p50, p95, p99, _ in rows:
+            lines.append(f"{name[:32]:<32} {count:>6} {p50 * 1000:>7.1f} {p95 * 1000:>7.1f} {p99 * 1000:>7.1f}")
+        
+        embed = discord.Embed(
+            title="⏱️ Latency (ms, slowest p95 first)",
+            description="```\n" + "\n".join(lines) + "\n```",
+            color=discord.Color.orange()
+        )
+        lag_count, lag_p50, _, lag_p99, _ = recorder.percentiles("loop.lag")
+        if lag_count:
+            embed.add_field(
+                name="Event Loop Lag",
+                value=f"p50 {lag_p50 * 1000:.1f}ms • p99 {lag_p99 * 1000:.1f}ms • worst {loop_monitor.max_lag * 1000:.0f}ms • "
+                      f"stalls {recorder.counters.get('loop.stalls', 0)}",
+                inline=False
+            )
+        
+        counters = [f"• **{name}** - {count}" for name, count in sorted(recorder.counters.items())]
+        if counters:
+            embed.add_field(name="Events", value="\n".join(counters[:20]), inline=False)
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(Perf(bot))
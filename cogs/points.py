@@ -3,8 +3,13 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 import os
-
-GUILD_ID = int(os.getenv('GUILD_ID'))
+import re
+import responses
+from responses import defer_when_slow
+from config import GUILDS
+from database import Admin
+from membernames import MemberNameCache, role_members
+from views import LEADERBOARD_PAGE_SIZE, LeaderboardView, build_leaderboard_embed
 
 # Load all admin role IDs from environment variables
 ADMIN_ROLE_IDS = []
@@ -13,47 +18,71 @@ for i in range(1, 10):  # Check up to ADMIN_ROLE_ID_9
     if role_id:
         ADMIN_ROLE_IDS.append(int(role_id))
 
+# Mentions (<@123>, <@!123>, role <@&123>, channel <#123>) and raw IDs in /pointbulk's users option
+USER_ID_PATTERN = re.compile(r'<(@!?|@&|#)(\d{15,20})>|\b(\d{15,20})\b')
+
+def parse_user_ids(text: str):
+    """User IDs from mentions and raw IDs, None if the text mentions a role or channel"""
+    user_ids = set()
+    for match in USER_ID_PATTERN.finditer(text):
+        kind, mention_id, raw_id = match.groups()
+        if raw_id:
+            user_ids.add(int(raw_id))
+        elif kind in ('@', '@!'):
+            user_ids.add(int(mention_id))
+        else:
+            return None
+    return user_ids
+
 class Points(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # (guild_id, page) -> (snapshot version, embed, has_next), reused until a balance changes
+        self.leaderboard_pages = {}
+        self.member_names = MemberNameCache()
     
     def has_specific_role(self, interaction: discord.Interaction) -> bool:
         """Check if user has ANY of the admin role IDs"""
         user_role_ids = [role.id for role in interaction.user.roles]
         return any(role_id in user_role_ids for role_id in ADMIN_ROLE_IDS)
     
-    async def safe_send(self, interaction: discord.Interaction, message: str = None, embed: discord.Embed = None, ephemeral: bool = False):
-        """Safely send message with error handling"""
-        try:
-            if not interaction.response.is_done():
-                if embed:
-                    await interaction.response.send_message(embed=embed, ephemeral=ephemeral)
-                else:
-                    await interaction.response.send_message(message, ephemeral=ephemeral)
-            else:
-                if embed:
-                    await interaction.followup.send(embed=embed, ephemeral=ephemeral)
-                else:
-                    await interaction.followup.send(message, ephemeral=ephemeral)
-        except (discord.errors.HTTPException, ConnectionError) as e:
-            logging.error(f"Failed to send message: {e}")
-            try:
-                if embed:
-                    await interaction.followup.send(embed=embed, ephemeral=ephemeral)
-                else:
-                    await interaction.followup.send(message, ephemeral=ephemeral)
-            except:
-                pass
+    async def safe_send(self, interaction: discord.Interaction, message: str = None, embed: discord.Embed = None, ephemeral: bool = False, view: discord.ui.View = None):
+        """Safely send message with error handling (followup once responded or deferred)"""
+        await responses.send(interaction, message, embed=embed, view=view, ephemeral=ephemeral)
+    
+    async def leaderboard_page(self, guild: discord.Guild, page: int):
+        """Rendered leaderboard page and whether a next page exists (None if the page is empty)"""
+        snapshot = self.bot.db.leaderboard(guild.id)
+        cached = self.leaderboard_pages.get((guild.id, page))
+        if cached and cached[0] == snapshot.version:
+            return cached[1], cached[2]
+        
+        # Fetch one extra row to know whether a next page exists
+        offset = page * LEADERBOARD_PAGE_SIZE
+        rows = await self.bot.db.get_leaderboard(guild.id, LEADERBOARD_PAGE_SIZE + 1, offset)
+        if not rows:
+            return None, False
+        
+        # One batched lookup for names that aren't cached
+        names = await self.member_names.resolve(guild, [user_id for user_id, _ in rows[:LEADERBOARD_PAGE_SIZE]])
+        embed = build_leaderboard_embed("All User Points", rows[:LEADERBOARD_PAGE_SIZE], names, page, "points")
+        has_next = len(rows) > LEADERBOARD_PAGE_SIZE
+        
+        # Only pages inside the snapshot are tracked by its version
+        if snapshot.can_serve(LEADERBOARD_PAGE_SIZE + 1, offset):
+            self.leaderboard_pages[(guild.id, page)] = (snapshot.version, embed, has_next)
+        return embed, has_next
     
     # REMOVED interaction_check - this was hiding the command!
     
     @app_commands.command(name="point", description="Manage user points (Specific Role Only)")
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.guilds(*GUILDS)
     @app_commands.describe(
         action="Choose action: increase, decrease, reset, list",
         user="Target user (optional for 'list')",
         amount="Amount of points (for increase/decrease)"
     )
+    @defer_when_slow()
     async def point(
         self, 
         interaction: discord.Interaction, 
@@ -70,7 +99,7 @@ class Points(commands.Cog):
         
         if action == "list":
             if user:
-                points = await self.bot.db.get_points(user.id)
+                points = await self.bot.db.get_points(interaction.guild_id, user.id)
                 embed = discord.Embed(
                     title=f"Points for {user.display_name}",
                     description=f"**{points}** points",
@@ -78,22 +107,13 @@ class Points(commands.Cog):
                 )
                 await self.safe_send(interaction, embed=embed)
             else:
-                all_points = await self.bot.db.get_all_points()
-                if not all_points:
+                embed, has_next = await self.leaderboard_page(interaction.guild, 0)
+                if embed is None:
                     await self.safe_send(interaction, "No users have points yet.")
                     return
                 
-                embed = discord.Embed(
-                    title="All User Points",
-                    color=discord.Color.orange()
-                )
-                
-                for user_id, points in all_points[:10]:
-                    member = interaction.guild.get_member(user_id)
-                    name = member.display_name if member else f"User {user_id}"
-                    embed.add_field(name=name, value=f"{points} points", inline=False)
-                
-                await self.safe_send(interaction, embed=embed)
+                view = LeaderboardView(self.leaderboard_page, interaction.user, has_next)
+                await self.safe_send(interaction, embed=embed, view=view)
             return
         
         if not user:
@@ -105,8 +125,7 @@ class Points(commands.Cog):
                 await self.safe_send(interaction, "Please provide a valid amount!", ephemeral=True)
                 return
             
-            await self.bot.db.add_points(user.id, amount)
-            new_points = await self.bot.db.get_points(user.id)
+            new_points = await self.bot.db.add_points(interaction.guild_id, user.id, amount, "increase", Admin.of(interaction.user))
             
             logging.info(f"ADMIN: {interaction.user.name} gave +{amount} points to {user.name} (Total: {new_points})")
             
@@ -120,8 +139,8 @@ class Points(commands.Cog):
                 await self.safe_send(interaction, "Please provide a valid amount!", ephemeral=True)
                 return
             
-            await self.bot.db.remove_points(user.id, amount)
-            new_points = await self.bot.db.get_points(user.id)
+            # Clamped at 0: the ledger gets the real change, taken in the same transaction
+            new_points = await self.bot.db.remove_points(interaction.guild_id, user.id, amount, "decrease", Admin.of(interaction.user))
             
             logging.info(f"ADMIN: {interaction.user.name} removed -{amount} points from {user.name} (Total: {new_points})")
             
@@ -131,7 +150,7 @@ class Points(commands.Cog):
             )
         
         elif action == "reset":
-            await self.bot.db.reset_points(user.id)
+            await self.bot.db.reset_points(interaction.guild_id, user.id, "reset", Admin.of(interaction.user))
             
             logging.info(f"ADMIN: {interaction.user.name} reset points for {user.name}")
             
@@ -146,6 +165,64 @@ class Points(commands.Cog):
                 "Invalid action! Use: increase, decrease, reset, or list",
                 ephemeral=True
             )
+    
+    @app_commands.command(name="pointbulk", description="Give or take points from many users at once (Specific Role Only)")
+    @app_commands.guilds(*GUILDS)
+    @app_commands.describe(
+        action="Choose action: increase, decrease",
+        amount="Amount of points per user",
+        role="Everyone with this role",
+        users="Mentions or IDs of users, separated by spaces"
+    )
+    @defer_when_slow()
+    async def pointbulk(
+        self,
+        interaction: discord.Interaction,
+        action: str,
+        amount: int,
+        role: discord.Role = None,
+        users: str = None
+    ):
+        if not self.has_specific_role(interaction):
+            await self.safe_send(interaction, "❌ You don't have the required role to manage points!", ephemeral=True)
+            return
+        
+        action = action.lower()
+        if action not in ("increase", "decrease"):
+            await self.safe_send(interaction, "Invalid action! Use: increase or decrease", ephemeral=True)
+            return
+        
+        if amount <= 0:
+            await self.safe_send(interaction, "Please provide a valid amount!", ephemeral=True)
+            return
+        
+        user_ids = set()
+        if users:
+            # A role or channel ID would otherwise be credited as if it were a user
+            mentioned = parse_user_ids(users)
+            if mentioned is None:
+                await self.safe_send(interaction, "Only users can be listed in users! Use the role option for roles.", ephemeral=True)
+                return
+            user_ids.update(mentioned)
+        if role:
+            members = await role_members(interaction.guild, role)
+            user_ids.update(member.id for member in members if not member.bot)
+        
+        if not user_ids:
+            await self.safe_send(interaction, "Please provide a role or at least one user!", ephemeral=True)
+            return
+        
+        # One transaction for everyone, ledger entries included
+        delta = amount if action == "increase" else -amount
+        await self.bot.db.add_points_many(interaction.guild_id, {user_id: delta for user_id in user_ids}, f"bulk_{action}", Admin.of(interaction.user))
+        
+        target = role.name if role else "selected users"
+        if action == "increase":
+            logging.info(f"ADMIN: {interaction.user.name} gave +{amount} points to {len(user_ids)} users ({target})")
+            await self.safe_send(interaction, f"Added **{amount}** points to **{len(user_ids)}** users!")
+        else:
+            logging.info(f"ADMIN: {interaction.user.name} removed -{amount} points from {len(user_ids)} users ({target})")
+            await self.safe_send(interaction, f"Removed **{amount}** points from **{len(user_ids)}** users!")
 
 async def setup(bot):
     await bot.add_cog(Points(bot))
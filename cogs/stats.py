@@ -0,0 +1,73 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import responses
+from responses import defer_when_slow
+from config import GUILDS
+
+def format_counts(counts: dict, limit: int = 10) -> str:
+    """'name - value' lines, biggest first"""
+    if not counts:
+        return "None yet"
+    ordered = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return "\n".join(f"• **{name}** - {value}" for name, value in ordered)
+
+def mention_keys(counts: dict) -> dict:
+    """Admin stats are keyed by user ID, show them as mentions (older name keys as they are)"""
+    return {f"<@{key}>" if key.isdigit() else key: value for key, value in counts.items()}
+
+class Stats(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+    
+    def has_admin_perms(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.guild_permissions.administrator
+    
+    @app_commands.command(name="stats", description="Game statistics (Admin Only)")
+    @app_commands.guilds(*GUILDS)
+    @app_commands.describe(hours="Window in hours (default 24)")
+    @defer_when_slow(ephemeral=True)
+    async def stats(self, interaction: discord.Interaction, hours: app_commands.Range[int, 1, 720] = 24):
+        if not self.has_admin_perms(interaction):
+            await responses.send(interaction, "You don't have permission!", ephemeral=True)
+            return
+        
+        # Counters are pre-aggregated per hour, so this reads at most `hours` buckets
+        window = await self.bot.db.get_stats(interaction.guild_id, hours)
+        total = await self.bot.db.get_stats(interaction.guild_id)
+        hourly = await self.bot.db.get_hourly(interaction.guild_id, "plays", min(hours, 12))
+        
+        def single(stats, metric):
+            return stats.get(metric, {}).get("", 0)
+        
+        embed = discord.Embed(
+            title=f"📊 Statistics (last {hours}h)",
+            color=discord.Color.orange()
+        )
+        embed.add_field(
+            name="Plays",
+            value=f"**{single(window, 'plays')}** ({single(total, 'plays')} all time)",
+            inline=True
+        )
+        embed.add_field(
+            name="Points Spent",
+            value=f"**{single(window, 'points_spent')}** ({single(total, 'points_spent')} all time)",
+            inline=True
+        )
+        embed.add_field(
+            name="Freeplays",
+            value=f"**{single(window, 'freeplays')}** ({single(total, 'freeplays')} all time)",
+            inline=True
+        )
+        embed.add_field(name="Outcomes", value=format_counts(window.get("outcomes", {})), inline=True)
+        embed.add_field(name="🎁 Rewards", value=format_counts(window.get("rewards", {})), inline=True)
+        embed.add_field(name="Admin Activity", value=format_counts(mention_keys(window.get("admin_actions", {}))), inline=False)
+        
+        if hourly:
+            lines = "\n".join(f"<t:{hour * 3600}:t> - {plays}" for hour, plays in hourly)
+            embed.add_field(name="Plays per Hour", value=lines, inline=False)
+        
+        await responses.send(interaction, embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(Stats(bot))
@@ -0,0 +1,45 @@
+import os
+import discord
+from dotenv import load_dotenv
+
+# Imported before bot.py gets to its own load_dotenv()
+load_dotenv()
+
+def parse_ids(value: str) -> list:
+    """'1, 2,3' -> [1, 2, 3]"""
+    return [int(part) for part in value.replace(' ', '').split(',') if part]
+
+def parse_shard_ids(value: str) -> list:
+    """'0-3,8' -> [0, 1, 2, 3, 8]"""
+    shard_ids = []
+    for part in value.replace(' ', '').split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            shard_ids.extend(range(int(first), int(last) + 1))
+        elif part:
+            shard_ids.append(int(part))
+    return shard_ids
+
+# Servers the bot runs in: slash commands are registered per guild, balances are kept per guild
+# GUILD_ID (a single server) is still accepted
+GUILD_IDS = parse_ids(os.getenv('GUILD_IDS') or os.getenv('GUILD_ID') or '')
+GUILDS = [discord.Object(id=guild_id) for guild_id in GUILD_IDS]
+
+# Balances from before they were kept per guild belong to this server
+LEGACY_GUILD_ID = int(os.getenv('LEGACY_GUILD_ID') or (GUILD_IDS[0] if GUILD_IDS else 0)) or None
+
+# Sharding: leave both unset to let Discord pick the shard count for one process.
+# To split across processes give every process the same SHARD_COUNT and its own SHARD_IDS range.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+SHARD_IDS = parse_shard_ids(os.getenv('SHARD_IDS', '')) or None
+
+# Don't keep every member of every guild in memory (names are looked up on demand instead)
+LEAN_MEMBER_CACHE = os.getenv('LEAN_MEMBER_CACHE', '').lower() in ('1', 'true', 'yes')
+
+def shard_for(guild_id: int) -> int:
+    """The shard Discord routes a guild's events to"""
+    return (guild_id >> 22) % SHARD_COUNT
+
+def owns_guild(guild_id: int) -> bool:
+    """Whether this process runs the guild's shard (always true without explicit SHARD_IDS)"""
+    return SHARD_IDS is None or shard_for(guild_id) in SHARD_IDS
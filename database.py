@@ -1,130 +1,917 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import NamedTuple, Optional
+
 import aiosqlite
 
+# Applied once to the shared connection in setup()
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Ledger actions written by play_round
+ROUND_OUTCOMES = ("trick", "treat", "jackpot")
+
+# stats_hourly bucket holding all-time totals (never pruned)
+ALL_TIME = 0
+
+# Tables that were keyed by user_id alone before balances were kept per guild
+LEGACY_TABLES = ("points", "freeplay_claimed", "message_counter")
+
+# Schema migrations in order, by Database method name: after the Nth one PRAGMA user_version is N.
+# Never edit or reorder a released migration, append a new one instead.
+MIGRATIONS = (
+    "_migrate_per_guild",
+    "_migrate_user_state",
+    "_migrate_admin_ids",
+)
+
+class Admin(NamedTuple):
+    """Who ran an admin action: recorded and counted by id, the name is only for display"""
+    id: int
+    name: str
+    
+    @classmethod
+    def of(cls, user) -> "Admin":
+        return cls(user.id, user.name)
+
+class RoundResult(NamedTuple):
+    """Outcome of Database.play_round and Database.play_freeplay"""
+    status: str  # "played", "used" (invite already consumed), "insufficient" (not enough points) or "claimed" (freeplay already used)
+    admin_name: Optional[str] = None
+    outcome: Optional[str] = None
+    reward: Optional[str] = None
+    points: int = 0
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used key, except keys that pinned(key) keeps"""
+    
+    def __init__(self, max_size: int, pinned=None):
+        self.max_size = max_size
+        self.pinned = pinned
+        self._data = OrderedDict()
+    
+    def __contains__(self, key):
+        return key in self._data
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+    
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._evict()
+    
+    def _evict(self):
+        if self.pinned is None:
+            self._data.popitem(last=False)
+            return
+        # Pinned keys stay even if that means going over max_size for a while,
+        # the excess goes as soon as they are unpinned
+        excess = len(self._data) - self.max_size
+        for key in list(islice((key for key in self._data if not self.pinned(key)), excess)):
+            del self._data[key]
+    
+    def setdefault(self, key, value):
+        """Cache value unless the key was written meanwhile, return the cached value"""
+        if key in self._data:
+            return self.get(key)
+        self.set(key, value)
+        return value
+    
+    def pop(self, key):
+        self._data.pop(key, None)
+    
+    def clear(self):
+        self._data.clear()
+
+class LeaderboardSnapshot:
+    """In-memory top-N of users with points, always an exact prefix of the DB order.
+    
+    Balance changes are applied incrementally: a user is kept (or inserted) only while
+    they still rank above the last entry, otherwise they drop out and the snapshot
+    shrinks. It is reloaded from the DB once it gets too short to serve a page.
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.loaded = False
+        self.complete = False  # True when the snapshot holds every row of the table
+        self.version = 0  # Bumped on every change, lets callers cache rendered pages
+        self._keys = []  # Sorted (-points, user_id)
+        self._points = {}  # user_id -> points for users in the snapshot
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def load(self, rows):
+        self._keys = sorted((-points, user_id) for user_id, points in rows)
+        self._points = {user_id: points for user_id, points in rows}
+        self.complete = len(rows) < self.size
+        self.loaded = True
+        self.version += 1
+    
+    def update(self, user_id: int, points: int):
+        if not self.loaded:
+            return
+        
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old, user_id))]
+        
+        # Outside users can only rank up to the last entry, so anything past it is unknown territory.
+        # Users at 0 points aren't listed at all.
+        key = (-points, user_id)
+        if points > 0 and (self.complete or (self._keys and key < self._keys[-1])):
+            insort(self._keys, key)
+            self._points[user_id] = points
+            if len(self._keys) > self.size:
+                _, dropped = self._keys.pop()
+                del self._points[dropped]
+                self.complete = False
+        
+        self.version += 1
+    
+    def can_serve(self, limit: int, offset: int) -> bool:
+        return self.loaded and (self.complete or offset + limit <= len(self._keys))
+    
+    def page(self, limit: int, offset: int):
+        return [(user_id, -neg_points) for neg_points, user_id in self._keys[offset:offset + limit]]
+
 class Database:
-    def __init__(self, db_path: str = 'points.db'):
+    def __init__(self, db_path: str = 'points.db', message_flush_interval: float = 5.0, message_flush_size: int = 500, cache_size: int = 10000, leaderboard_size: int = 100, pending_game_ttl: int = 7 * 24 * 3600, stats_retention_hours: int = 30 * 24, legacy_guild_id: int = None):
         self.db_path = db_path
+        self.conn = None
+        self.pending_game_ttl = pending_game_ttl
+        # Rows from before balances were kept per guild are moved to this guild
+        self.legacy_guild_id = legacy_guild_id
+        # Write-through caches keyed by (guild_id, user_id): every mutation below updates them,
+        # so reads of hot users never hit SQLite
+        self.points_cache = LRUCache(cache_size)
+        self.freeplay_cache = LRUCache(cache_size)
+        self.leaderboard_size = leaderboard_size
+        self.leaderboards = {}  # guild_id -> LeaderboardSnapshot
+        # Serializes writes so a multi-statement transaction never interleaves with other writers
+        self.write_lock = asyncio.Lock()
+        
+        # Write-behind message counter: totals are served from memory, increments flushed in batches
+        self.message_flush_interval = message_flush_interval
+        self.message_flush_size = message_flush_size
+        self._pending_messages = {}  # (guild_id, user_id) -> increments not yet written
+        self._flushing_messages = {}  # increments being written by flush_message_counts
+        # (guild_id, user_id) -> total count (persisted + pending); a total with unwritten
+        # increments is the only up to date one, so it can't be evicted
+        self._message_counts = LRUCache(
+            cache_size,
+            pinned=lambda key: key in self._pending_messages or key in self._flushing_messages
+        )
+        self._flush_wakeup = asyncio.Event()
+        # Ledger entries waiting for the flush loop: (guild_id, user_id, admin_id, admin, action, delta, reward, created_at)
+        self._ledger_queue = []
+        
+        # Pre-aggregated statistics: (guild_id, hour, metric, key) -> increment, flushed with the ledger
+        self.stats_retention_hours = stats_retention_hours
+        self._pending_stats = {}
+        self._flush_task = None
+        self._stopping = False
     
     async def setup(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            # Points table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS points (
-                    user_id INTEGER PRIMARY KEY,
-                    points INTEGER DEFAULT 0
-                )
-            """)
-            
-            # Freeplay tracking table
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS freeplay_claimed (
-                    user_id INTEGER PRIMARY KEY,
-                    claimed INTEGER DEFAULT 0
-                )
-            """)
-            
-            # MESSAGE COUNTER TABLE (NEW)
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS message_counter (
-                    user_id INTEGER PRIMARY KEY,
-                    message_count INTEGER DEFAULT 0
-                )
-            """)
-            
-            await db.commit()
+        """Open the shared connection (only once) and bring the schema up to date"""
+        if self.conn is None:
+            # Autocommit mode: each statement commits on its own, no db.commit() needed
+            self.conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+            for pragma in PRAGMAS:
+                await self.conn.execute(pragma)
+        
+        try:
+            await self._migrate()
+        except Exception:
+            # The connection's worker thread would otherwise keep the process alive
+            await self.conn.close()
+            self.conn = None
+            raise
+        await self.purge_pending_games()
+        
+        if self._flush_task is None:
+            self._stopping = False
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        
         print(f"Database ready: {self.db_path}")
     
-    async def get_points(self, user_id: int) -> int:
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT points FROM points WHERE user_id = ?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
+    async def _migrate(self):
+        """Apply the MIGRATIONS newer than the file's user_version, each in its own transaction"""
+        for target, name in enumerate(MIGRATIONS, start=1):
+            async with self.transaction() as db:
+                # Read under the write lock: another process (shard range) on the same file
+                # may have applied this migration while we waited for it
+                async with db.execute("PRAGMA user_version") as cursor:
+                    version = (await cursor.fetchone())[0]
+                if version >= target:
+                    continue
+                await getattr(self, name)(db)
+                # Part of the transaction: a failed migration leaves the version where it was
+                await db.execute(f"PRAGMA user_version = {target}")
+            logging.info(f"Database migrated to version {target} ({name})")
+    
+    async def _migrate_per_guild(self, db):
+        """Version 1: every table keyed by (guild_id, user_id).
+        
+        Also the baseline for files from before versioning: tables are created if missing,
+        older tables without a guild_id column are renamed, recreated and copied back
+        into legacy_guild_id.
+        """
+        async with db.execute("SELECT name FROM sqlite_master WHERE type = 'table'") as cursor:
+            existing = {row[0] for row in await cursor.fetchall()}
+        legacy = [table for table in LEGACY_TABLES if table in existing and not await self._has_column(table, "guild_id")]
+        if legacy and self.legacy_guild_id is None:
+            raise ValueError("The database holds data from before per-guild balances, set legacy_guild_id")
+        
+        for table in legacy:
+            await db.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+        
+        # Points table
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS points (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                points INTEGER DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        
+        # Freeplay tracking table
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS freeplay_claimed (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                claimed INTEGER DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        
+        # MESSAGE COUNTER TABLE (NEW)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS message_counter (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                message_count INTEGER DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        
+        # Invites whose buttons haven't been pressed yet (state for the persistent buttons)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS pending_games (
+                game_id INTEGER PRIMARY KEY,
+                guild_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                admin_name TEXT,
+                is_secret INTEGER DEFAULT 0,
+                created_at INTEGER NOT NULL
+            )
+        """)
+        
+        # Append-only audit trail of every balance change, game round and freeplay claim
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS ledger (
+                entry_id INTEGER PRIMARY KEY,
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER,
+                admin TEXT,
+                action TEXT NOT NULL,
+                delta INTEGER DEFAULT 0,
+                reward TEXT,
+                created_at INTEGER NOT NULL
+            )
+        """)
+        
+        # Counters rolled up per hour (hour = unix time // 3600, ALL_TIME bucket for totals)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS stats_hourly (
+                guild_id INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                metric TEXT NOT NULL,
+                key TEXT NOT NULL DEFAULT '',
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, hour, metric, key)
+            ) WITHOUT ROWID
+        """)
+        
+        for table in legacy:
+            columns = ", ".join(await self._columns(f"{table}_legacy"))
+            await db.execute(
+                f"INSERT INTO {table} (guild_id, {columns}) SELECT ?, {columns} FROM {table}_legacy",
+                (self.legacy_guild_id,)
+            )
+            await db.execute(f"DROP TABLE {table}_legacy")
+        if legacy:
+            logging.info(f"Moved {', '.join(legacy)} to guild {self.legacy_guild_id}")
+        
+        # Created after the copy: the old tables' indexes had the same names until they were dropped
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (guild_id, user_id, created_at)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_ledger_time ON ledger (created_at)")
+        # Leaderboard indexes: pages are read straight off the index in order
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_points_leaderboard ON points (guild_id, points DESC, user_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_message_counter_leaderboard ON message_counter (guild_id, message_count DESC, user_id)")
+    
+    async def _migrate_user_state(self, db):
+        """Version 2: points, message count and freeplay claim in one row per (guild, user)"""
+        await db.execute("""
+            CREATE TABLE user_state (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                points INTEGER NOT NULL DEFAULT 0,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                freeplay_claimed INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            ) WITHOUT ROWID
+        """)
+        await db.execute("""
+            INSERT INTO user_state (guild_id, user_id, points, message_count, freeplay_claimed)
+            SELECT guild_id, user_id, SUM(points), SUM(message_count), MAX(claimed) FROM (
+                SELECT guild_id, user_id, COALESCE(points, 0) AS points, 0 AS message_count, 0 AS claimed FROM points
+                UNION ALL
+                SELECT guild_id, user_id, 0, COALESCE(message_count, 0), 0 FROM message_counter
+                UNION ALL
+                SELECT guild_id, user_id, 0, 0, COALESCE(claimed, 0) FROM freeplay_claimed
+            ) GROUP BY guild_id, user_id
+        """)
+        for table in ("points", "message_counter", "freeplay_claimed"):
+            await db.execute(f"DROP TABLE {table}")
+        
+        # Leaderboards only list users who have points / messages, so only they are indexed
+        await db.execute("CREATE INDEX idx_user_state_points ON user_state (guild_id, points DESC, user_id) WHERE points > 0")
+        await db.execute("CREATE INDEX idx_user_state_messages ON user_state (guild_id, message_count DESC, user_id) WHERE message_count > 0")
+    
+    async def _migrate_admin_ids(self, db):
+        """Version 3: admins are identified by user ID (names can be changed and reused)"""
+        await db.execute("ALTER TABLE ledger ADD COLUMN admin_id INTEGER")
+        await db.execute("ALTER TABLE pending_games ADD COLUMN admin_id INTEGER")
+    
+    async def close(self):
+        """Flush pending writes and close the shared connection (called on bot shutdown)"""
+        if self._flush_task is not None:
+            # Ask the loop to exit rather than cancel it: wait_for() swallows a cancel
+            # that lands just as the wakeup event is set, and close() would hang
+            self._stopping = True
+            self._flush_wakeup.set()
+            await self._flush_task
+            self._flush_task = None
+        
+        if self.conn is not None:
+            await self.flush()
+            await self.conn.close()
+            self.conn = None
+    
+    async def _columns(self, table: str) -> list:
+        return [row[1] for row in await self._fetchall(f"PRAGMA table_info({table})")]
+    
+    async def _has_column(self, table: str, column: str) -> bool:
+        return column in await self._columns(table)
+    
+    async def _fetchone(self, query: str, params: tuple = ()):
+        async with self.conn.execute(query, params) as cursor:
+            return await cursor.fetchone()
+    
+    async def _fetchall(self, query: str, params: tuple = ()):
+        async with self.conn.execute(query, params) as cursor:
+            return await cursor.fetchall()
+    
+    async def _execute(self, query: str, params: tuple = ()):
+        """Run a single write statement"""
+        async with self.write_lock:
+            await self.conn.execute(query, params)
     
-    async def set_points(self, user_id: int, points: int):
-        async with aiosqlite.connect(self.db_path) as db:
+    async def _execute_returning(self, query: str, params: tuple = ()):
+        """Run a single write statement and return its RETURNING row"""
+        async with self.write_lock:
+            return await self._fetchone(query, params)
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """Run several statements as one transaction (one commit)"""
+        async with self.write_lock:
+            await self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                await self.conn.execute("ROLLBACK")
+                raise
+            else:
+                await self.conn.execute("COMMIT")
+    
+    # USER STATE (points, message count and freeplay claim share one row)
+    async def get_user_state(self, guild_id: int, user_id: int):
+        """(points, message_count, freeplay_claimed) in one query, warming all three caches"""
+        key = (guild_id, user_id)
+        row = await self._fetchone(
+            "SELECT points, message_count, freeplay_claimed FROM user_state WHERE guild_id = ? AND user_id = ?",
+            key
+        )
+        points, message_count, claimed = row or (0, 0, 0)
+        # Anything cached meanwhile is newer than this row
+        return (
+            self.points_cache.setdefault(key, points),
+            self._message_counts.setdefault(key, message_count),
+            self.freeplay_cache.setdefault(key, bool(claimed)),
+        )
+    
+    async def get_user_states(self, guild_id: int, user_ids) -> dict:
+        """{user_id: (points, message_count, freeplay_claimed)} for many users, one chunked query"""
+        user_ids = list(user_ids)
+        rows = {}
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for user_id, *state in await self._fetchall(
+                f"SELECT user_id, points, message_count, freeplay_claimed FROM user_state WHERE guild_id = ? AND user_id IN ({placeholders})",
+                (guild_id, *chunk)
+            ):
+                rows[user_id] = state
+        
+        states = {}
+        for user_id in user_ids:
+            key = (guild_id, user_id)
+            points, message_count, claimed = rows.get(user_id, (0, 0, 0))
+            states[user_id] = (
+                self.points_cache.setdefault(key, points),
+                self._message_counts.setdefault(key, message_count),
+                self.freeplay_cache.setdefault(key, bool(claimed)),
+            )
+        return states
+    
+    async def get_points(self, guild_id: int, user_id: int) -> int:
+        if (guild_id, user_id) in self.points_cache:
+            return self.points_cache.get((guild_id, user_id))
+        
+        points, _, _ = await self.get_user_state(guild_id, user_id)
+        return points
+    
+    async def set_points(self, guild_id: int, user_id: int, points: int, action: str = None, admin: Admin = None):
+        """Set a balance; with action, its ledger entry (real delta) is written in the same transaction"""
+        async with self.transaction() as db:
+            old = (await self._get_points_many(guild_id, [user_id])).get(user_id, 0)
             await db.execute("""
-                INSERT INTO points (user_id, points) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET points = ?
-            """, (user_id, points, points))
-            await db.commit()
+                INSERT INTO user_state (guild_id, user_id, points) VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET points = ?
+            """, (guild_id, user_id, points, points))
+            if action:
+                await self._write_ledger(db, guild_id, action, admin, {user_id: points - old})
+        self._points_changed(guild_id, user_id, points)
+        if action:
+            self._count_stats(guild_id, action, points - old, admin)
+    
+    async def add_points(self, guild_id: int, user_id: int, amount: int, action: str = None, admin: Admin = None) -> int:
+        """Atomically add points (clamped at 0) and return the new balance.
+        
+        With action, the ledger entry is written in the same transaction as the change, with the
+        real (clamped) delta, so concurrent changes can't make it disagree with the balance.
+        """
+        if action:
+            return (await self.add_points_many(guild_id, {user_id: amount}, action, admin))[user_id]
+        
+        result = await self._execute_returning("""
+            INSERT INTO user_state (guild_id, user_id, points) VALUES (?, ?, MAX(0, ?))
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET points = MAX(0, points + ?)
+            RETURNING points
+        """, (guild_id, user_id, amount, amount))
+        self._points_changed(guild_id, user_id, result[0])
+        return result[0]
+    
+    async def remove_points(self, guild_id: int, user_id: int, amount: int, action: str = None, admin: Admin = None) -> int:
+        """Atomically remove points (clamped at 0) and return the new balance"""
+        return await self.add_points(guild_id, user_id, -amount, action, admin)
+    
+    async def add_points_many(self, guild_id: int, amounts: dict, action: str = None, admin: Admin = None) -> dict:
+        """Add points to many users (user_id -> amount, clamped at 0) in one transaction, return new balances.
+        
+        With action, every user's ledger entry (real delta) is part of the same transaction.
+        """
+        if not amounts:
+            return {}
+        
+        async with self.transaction() as db:
+            if action:
+                old = await self._get_points_many(guild_id, list(amounts))
+            await db.executemany("""
+                INSERT INTO user_state (guild_id, user_id, points) VALUES (?, ?, MAX(0, ?))
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET points = MAX(0, points + ?)
+            """, [(guild_id, user_id, amount, amount) for user_id, amount in amounts.items()])
+            balances = await self._get_points_many(guild_id, list(amounts))
+            if action:
+                deltas = {user_id: points - old.get(user_id, 0) for user_id, points in balances.items()}
+                await self._write_ledger(db, guild_id, action, admin, deltas)
+        
+        for user_id, points in balances.items():
+            self._points_changed(guild_id, user_id, points)
+            if action:
+                self._count_stats(guild_id, action, deltas[user_id], admin)
+        return balances
+    
+    async def remove_points_many(self, guild_id: int, amounts: dict, action: str = None, admin: Admin = None) -> dict:
+        """Remove points from many users (user_id -> amount, clamped at 0) in one transaction, return new balances"""
+        return await self.add_points_many(guild_id, {user_id: -amount for user_id, amount in amounts.items()}, action, admin)
+    
+    async def get_points_many(self, guild_id: int, user_ids) -> dict:
+        """Balances for many users: cache hits first, one chunked query for the rest"""
+        balances = {}
+        missing = []
+        for user_id in user_ids:
+            if (guild_id, user_id) in self.points_cache:
+                balances[user_id] = self.points_cache.get((guild_id, user_id))
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            found = await self._get_points_many(guild_id, missing)
+            for user_id in missing:
+                balances[user_id] = self.points_cache.setdefault((guild_id, user_id), found.get(user_id, 0))
+        return balances
+    
+    async def _get_points_many(self, guild_id: int, user_ids: list) -> dict:
+        """Balances for many users straight from the DB, chunked to stay under SQLite's variable limit"""
+        balances = {}
+        for i in range(0, len(user_ids), 500):
+            chunk = user_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = await self._fetchall(
+                f"SELECT user_id, points FROM user_state WHERE guild_id = ? AND user_id IN ({placeholders})",
+                (guild_id, *chunk)
+            )
+            balances.update(rows)
+        return balances
     
-    async def add_points(self, user_id: int, amount: int):
-        current = await self.get_points(user_id)
-        await self.set_points(user_id, current + amount)
+    def _points_changed(self, guild_id: int, user_id: int, points: int):
+        """Write a new balance through to the cache and leaderboard snapshot"""
+        self.points_cache.set((guild_id, user_id), points)
+        self.leaderboard(guild_id).update(user_id, points)
     
-    async def remove_points(self, user_id: int, amount: int):
-        current = await self.get_points(user_id)
-        new_amount = max(0, current - amount)
-        await self.set_points(user_id, new_amount)
+    async def reset_points(self, guild_id: int, user_id: int, action: str = None, admin: Admin = None):
+        await self.set_points(guild_id, user_id, 0, action, admin)
     
-    async def reset_points(self, user_id: int):
-        await self.set_points(user_id, 0)
+    def leaderboard(self, guild_id: int) -> LeaderboardSnapshot:
+        """The guild's leaderboard snapshot (empty and unloaded until its first page is read)"""
+        snapshot = self.leaderboards.get(guild_id)
+        if snapshot is None:
+            snapshot = self.leaderboards[guild_id] = LeaderboardSnapshot(self.leaderboard_size)
+        return snapshot
     
-    async def get_all_points(self):
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT user_id, points FROM points ORDER BY points DESC") as cursor:
-                return await cursor.fetchall()
+    async def get_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0):
+        """One page of (user_id, points), highest first (served from the snapshot when it covers the page)"""
+        snapshot = self.leaderboard(guild_id)
+        if not snapshot.can_serve(limit, offset) and offset + limit <= snapshot.size:
+            # Snapshot not loaded yet, or shrunk below this page: refill it
+            rows = await self._fetchall(
+                "SELECT user_id, points FROM user_state WHERE guild_id = ? AND points > 0 ORDER BY points DESC, user_id LIMIT ?",
+                (guild_id, snapshot.size)
+            )
+            snapshot.load(rows)
+        
+        if snapshot.can_serve(limit, offset):
+            return snapshot.page(limit, offset)
+        
+        return await self._fetchall(
+            "SELECT user_id, points FROM user_state WHERE guild_id = ? AND points > 0 ORDER BY points DESC, user_id LIMIT ? OFFSET ?",
+            (guild_id, limit, offset)
+        )
     
     # FREEPLAY TRACKING
-    async def has_claimed_freeplay(self, user_id: int) -> bool:
+    async def has_claimed_freeplay(self, guild_id: int, user_id: int) -> bool:
         """Check if user has already claimed freeplay"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT claimed FROM freeplay_claimed WHERE user_id = ?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] == 1 if result else False
-    
-    async def mark_freeplay_claimed(self, user_id: int):
-        """Mark that user has claimed their freeplay"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT INTO freeplay_claimed (user_id, claimed) VALUES (?, 1)
-                ON CONFLICT(user_id) DO UPDATE SET claimed = 1
-            """, (user_id,))
-            await db.commit()
+        if (guild_id, user_id) in self.freeplay_cache:
+            return self.freeplay_cache.get((guild_id, user_id))
+        
+        _, _, claimed = await self.get_user_state(guild_id, user_id)
+        return claimed
     
-    async def reset_freeplay(self, user_id: int):
+    async def reset_freeplay(self, guild_id: int, user_id: int):
         """Reset freeplay claim for a user (admin only)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM freeplay_claimed WHERE user_id = ?", (user_id,))
-            await db.commit()
+        await self._execute("UPDATE user_state SET freeplay_claimed = 0 WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        self.freeplay_cache.set((guild_id, user_id), False)
     
-    async def reset_all_freeplays(self):
-        """Reset ALL freeplay claims (admin only)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("DELETE FROM freeplay_claimed")
-            await db.commit()
+    async def reset_all_freeplays(self, guild_id: int):
+        """Reset ALL freeplay claims of a guild (admin only)"""
+        await self._execute("UPDATE user_state SET freeplay_claimed = 0 WHERE guild_id = ? AND freeplay_claimed = 1", (guild_id,))
+        # Other guilds' entries go too, they are reloaded on demand
+        self.freeplay_cache.clear()
     
-    # MESSAGE COUNTER FOR AUTO POINTS
-    async def get_message_count(self, user_id: int) -> int:
-        """Get user's message count"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT message_count FROM message_counter WHERE user_id = ?", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else 0
-    
-    async def increment_message_count(self, user_id: int) -> int:
-        """Increment message count and return new count"""
-        async with aiosqlite.connect(self.db_path) as db:
-            current_count = await self.get_message_count(user_id)
-            new_count = current_count + 1
+    # PENDING GAMES (persistent invite buttons)
+    async def create_pending_game(self, guild_id: int, kind: str, user_id: int, admin: Admin, is_secret: bool = False) -> int:
+        """Store an invite and return its game_id (encoded in the buttons' custom_id)"""
+        result = await self._execute_returning("""
+            INSERT INTO pending_games (guild_id, kind, user_id, admin_id, admin_name, is_secret, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+            RETURNING game_id
+        """, (guild_id, kind, user_id, admin.id, admin.name, int(is_secret), int(time.time())))
+        return result[0]
+    
+    async def create_pending_games(self, guild_id: int, kind: str, user_ids, admin: Admin) -> dict:
+        """Store one invite per user in a single transaction, {user_id: game_id}"""
+        game_ids = {}
+        now = int(time.time())
+        async with self.transaction() as db:
+            for user_id in user_ids:
+                async with db.execute(
+                    "INSERT INTO pending_games (guild_id, kind, user_id, admin_id, admin_name, is_secret, created_at) VALUES (?, ?, ?, ?, ?, 0, ?) RETURNING game_id",
+                    (guild_id, kind, user_id, admin.id, admin.name, now)
+                ) as cursor:
+                    game_ids[user_id] = (await cursor.fetchone())[0]
+        return game_ids
+    
+    def _invite_cutoff(self) -> int:
+        """created_at of the oldest invite that can still be played"""
+        return int(time.time()) - self.pending_game_ttl
+    
+    async def purge_pending_games(self):
+        """Drop invites older than pending_game_ttl"""
+        await self._execute("DELETE FROM pending_games WHERE created_at < ?", (self._invite_cutoff(),))
+    
+    async def claim_pending_game(self, guild_id: int, game_id: int, user_id: int):
+        """Atomically remove an invite, return (admin_name, is_secret) or None if it was already used"""
+        result = await self._execute_returning(
+            "DELETE FROM pending_games WHERE game_id = ? AND guild_id = ? AND user_id = ? RETURNING admin_name, is_secret",
+            (game_id, guild_id, user_id)
+        )
+        return (result[0], bool(result[1])) if result else None
+    
+    async def play_round(self, guild_id: int, user_id: int, cost: int, game_id: int, roll) -> RoundResult:
+        """Consume an invite, debit cost, roll and record the round in ONE transaction.
+        
+        roll(is_secret) -> (outcome, reward) is called inside the transaction once the
+        debit succeeded, so it must be quick and must not await anything.
+        """
+        async with self.transaction() as db:
+            async with db.execute(
+                # An expired invite counts as used, even before the hourly purge removes it
+                "DELETE FROM pending_games WHERE game_id = ? AND guild_id = ? AND user_id = ? AND created_at >= ? RETURNING admin_id, admin_name, is_secret",
+                (game_id, guild_id, user_id, self._invite_cutoff())
+            ) as cursor:
+                game = await cursor.fetchone()
+            if game is None:
+                return RoundResult("used")
+            admin_id, admin_name, is_secret = game
+            
+            # Conditional debit: no row back means the balance was too low
+            async with db.execute(
+                "UPDATE user_state SET points = points - ? WHERE guild_id = ? AND user_id = ? AND points >= ? RETURNING points",
+                (cost, guild_id, user_id, cost)
+            ) as cursor:
+                debited = await cursor.fetchone()
+            if debited is None:
+                return RoundResult("insufficient", admin_name)
+            points = debited[0]
             
+            outcome, reward = roll(bool(is_secret))
+            # Written here rather than queued so the round and its debit commit together
             await db.execute("""
-                INSERT INTO message_counter (user_id, message_count) VALUES (?, ?)
-                ON CONFLICT(user_id) DO UPDATE SET message_count = ?
-            """, (user_id, new_count, new_count))
-            await db.commit()
-            return new_count
+                INSERT INTO ledger (guild_id, user_id, admin_id, admin, action, delta, reward, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (guild_id, user_id, admin_id, admin_name, outcome, -cost, reward, int(time.time())))
+        
+        self._points_changed(guild_id, user_id, points)
+        self._count_stats(guild_id, outcome, -cost, reward=reward)
+        return RoundResult("played", admin_name, outcome, reward, points)
     
-    async def reset_message_count(self, user_id: int):
-        """Reset message count to 0"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def play_freeplay(self, guild_id: int, user_id: int, game_id: int, roll) -> RoundResult:
+        """Consume a freeplay invite, set the user's one-time claim, roll and record it in ONE transaction.
+        
+        Two invites pressed at once can't both win: only one UPDATE flips freeplay_claimed.
+        roll() -> reward is called inside the transaction, so it must be quick and must not await.
+        """
+        key = (guild_id, user_id)
+        async with self.transaction() as db:
+            async with db.execute(
+                "DELETE FROM pending_games WHERE game_id = ? AND guild_id = ? AND user_id = ? AND created_at >= ? RETURNING admin_id, admin_name",
+                (game_id, guild_id, user_id, self._invite_cutoff())
+            ) as cursor:
+                game = await cursor.fetchone()
+            if game is None:
+                return RoundResult("used")
+            admin_id, admin_name = game
+            
+            # No row back means the freeplay was claimed already (the invite is used up all the same)
+            async with db.execute("""
+                INSERT INTO user_state (guild_id, user_id, freeplay_claimed) VALUES (?, ?, 1)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET freeplay_claimed = 1 WHERE freeplay_claimed = 0
+                RETURNING points
+            """, key) as cursor:
+                claimed = await cursor.fetchone()
+            if claimed is None:
+                self.freeplay_cache.set(key, True)
+                return RoundResult("claimed", admin_name)
+            
+            reward = roll()
             await db.execute("""
-                INSERT INTO message_counter (user_id, message_count) VALUES (?, 0)
-                ON CONFLICT(user_id) DO UPDATE SET message_count = 0
-            """, (user_id,))
-            await db.commit()
-    
-    async def get_all_message_counts(self):
-        """Get all user message counts"""
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT user_id, message_count FROM message_counter ORDER BY message_count DESC") as cursor:
-                return await cursor.fetchall()
\ No newline at end of file
+                INSERT INTO ledger (guild_id, user_id, admin_id, admin, action, delta, reward, created_at) VALUES (?, ?, ?, ?, 'freeplay', 0, ?, ?)
+            """, (guild_id, user_id, admin_id, admin_name, reward, int(time.time())))
+        
+        self.freeplay_cache.set(key, True)
+        self._count_stats(guild_id, "freeplay", 0, reward=reward)
+        return RoundResult("played", admin_name, "freeplay", reward, claimed[0])
+    
+    # MESSAGE COUNTER FOR AUTO POINTS
+    async def get_message_count(self, guild_id: int, user_id: int) -> int:
+        """Get user's message count (including increments not flushed yet)"""
+        message_count = self._message_counts.get((guild_id, user_id))
+        if message_count is not None:
+            return message_count
+        
+        _, message_count, _ = await self.get_user_state(guild_id, user_id)
+        return message_count
+    
+    async def increment_message_count(self, guild_id: int, user_id: int) -> int:
+        """Increment message count in memory and return new count (written by the flush loop)"""
+        key = (guild_id, user_id)
+        new_count = await self.get_message_count(guild_id, user_id) + 1
+        # Pending first, which pins the key before it is cached
+        self._pending_messages[key] = self._pending_messages.get(key, 0) + 1
+        self._message_counts.set(key, new_count)
+        
+        if len(self._pending_messages) >= self.message_flush_size:
+            self._flush_wakeup.set()
+        return new_count
+    
+    async def flush_message_counts(self):
+        """Write all buffered message count increments in one transaction"""
+        if not self._pending_messages:
+            return
+        
+        pending, self._pending_messages = self._pending_messages, {}
+        self._flushing_messages = pending
+        try:
+            async with self.transaction() as db:
+                await db.executemany("""
+                    INSERT INTO user_state (guild_id, user_id, message_count) VALUES (?, ?, ?)
+                    ON CONFLICT(guild_id, user_id) DO UPDATE SET message_count = message_count + excluded.message_count
+                """, [(*key, count) for key, count in pending.items()])
+        except Exception:
+            # Put the increments back so the next flush retries them
+            for key, count in pending.items():
+                self._pending_messages[key] = self._pending_messages.get(key, 0) + count
+            raise
+        finally:
+            self._flushing_messages = {}
+    
+    # LEDGER (audit trail)
+    def record(self, guild_id: int, action: str, user_id: int = None, delta: int = 0, admin: Admin = None, reward: str = None):
+        """Queue a ledger entry, written in batches by the flush loop"""
+        admin_id, admin_name = admin or (None, None)
+        self._ledger_queue.append((guild_id, user_id, admin_id, admin_name, action, delta, reward, int(time.time())))
+        self._count_stats(guild_id, action, delta, admin, reward)
+        if len(self._ledger_queue) >= self.message_flush_size:
+            self._flush_wakeup.set()
+    
+    async def _write_ledger(self, db, guild_id: int, action: str, admin: Optional[Admin], deltas: dict):
+        """Ledger entries for balance changes, inside the caller's transaction (stats are counted after commit)"""
+        admin_id, admin_name = admin or (None, None)
+        now = int(time.time())
+        await db.executemany("""
+            INSERT INTO ledger (guild_id, user_id, admin_id, admin, action, delta, reward, created_at) VALUES (?, ?, ?, ?, ?, ?, NULL, ?)
+        """, [(guild_id, user_id, admin_id, admin_name, action, delta, now) for user_id, delta in deltas.items()])
+    
+    async def flush_ledger(self):
+        """Write all queued ledger entries and stats increments in one transaction"""
+        if not self._ledger_queue and not self._pending_stats:
+            return
+        
+        entries, self._ledger_queue = self._ledger_queue, []
+        stats, self._pending_stats = self._pending_stats, {}
+        try:
+            async with self.transaction() as db:
+                await db.executemany("""
+                    INSERT INTO ledger (guild_id, user_id, admin_id, admin, action, delta, reward, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, entries)
+                await db.executemany("""
+                    INSERT INTO stats_hourly (guild_id, hour, metric, key, value) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(guild_id, hour, metric, key) DO UPDATE SET value = value + excluded.value
+                """, [(*bucket, value) for bucket, value in stats.items()])
+        except Exception:
+            # Keep order: failed entries go back in front of anything queued meanwhile
+            self._ledger_queue = entries + self._ledger_queue
+            for bucket, value in stats.items():
+                self._pending_stats[bucket] = self._pending_stats.get(bucket, 0) + value
+            raise
+    
+    # STATISTICS (pre-aggregated per hour)
+    def _count_stats(self, guild_id: int, action: str, delta: int, admin: Admin = None, reward: str = None):
+        """Turn one ledger entry into counter increments for this hour and the all-time bucket"""
+        increments = []  # (metric, key, value)
+        if action in ROUND_OUTCOMES:
+            increments += [("plays", "", 1), ("outcomes", action, 1), ("points_spent", "", -delta)]
+        elif action == "freeplay":
+            increments.append(("freeplays", "", 1))
+        elif admin:
+            # Keyed by ID so a renamed admin keeps their totals (shown as a mention)
+            increments += [("admin_actions", str(admin.id), 1), ("admin_points", str(admin.id), delta)]
+        if reward:
+            increments.append(("rewards", reward, 1))
+        
+        hour = int(time.time()) // 3600
+        for metric, key, value in increments:
+            for bucket in ((guild_id, hour, metric, key), (guild_id, ALL_TIME, metric, key)):
+                self._pending_stats[bucket] = self._pending_stats.get(bucket, 0) + value
+    
+    async def get_stats(self, guild_id: int, hours: int = None) -> dict:
+        """{metric: {key: value}} summed over the last `hours` hours (all time when None)"""
+        await self.flush_ledger()
+        if hours is None:
+            rows = await self._fetchall(
+                "SELECT metric, key, value FROM stats_hourly WHERE guild_id = ? AND hour = ?",
+                (guild_id, ALL_TIME)
+            )
+        else:
+            since = int(time.time()) // 3600 - hours + 1
+            rows = await self._fetchall(
+                "SELECT metric, key, SUM(value) FROM stats_hourly WHERE guild_id = ? AND hour >= ? GROUP BY metric, key",
+                (guild_id, since)
+            )
+        
+        stats = {}
+        for metric, key, value in rows:
+            stats.setdefault(metric, {})[key] = value
+        return stats
+    
+    async def get_hourly(self, guild_id: int, metric: str, hours: int = 12):
+        """[(hour, value)] of one metric (summed over keys) for the last `hours` hours, oldest first"""
+        await self.flush_ledger()
+        since = int(time.time()) // 3600 - hours + 1
+        return await self._fetchall(
+            "SELECT hour, SUM(value) FROM stats_hourly WHERE guild_id = ? AND hour >= ? AND metric = ? GROUP BY hour ORDER BY hour",
+            (guild_id, since, metric)
+        )
+    
+    async def prune_stats(self):
+        """Drop hourly buckets older than the retention window (all-time totals stay)"""
+        oldest = int(time.time()) // 3600 - self.stats_retention_hours
+        await self._execute("DELETE FROM stats_hourly WHERE hour > ? AND hour < ?", (ALL_TIME, oldest))
+    
+    async def get_ledger(self, guild_id: int, user_id: int, limit: int = 20):
+        """Most recent ledger entries for a user"""
+        await self.flush_ledger()
+        return await self._fetchall("""
+            SELECT admin_id, admin, action, delta, reward, created_at FROM ledger
+            WHERE guild_id = ? AND user_id = ? ORDER BY created_at DESC, entry_id DESC LIMIT ?
+        """, (guild_id, user_id, limit))
+    
+    async def flush(self):
+        """Write everything buffered in memory (message counts and ledger)"""
+        await self.flush_message_counts()
+        await self.flush_ledger()
+    
+    async def _flush_loop(self):
+        last_prune_hour = None
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.message_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            if self._stopping:
+                # close() does the final flush
+                return
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Database flush failed: {e}")
+            
+            # Once an hour is plenty for retention
+            if int(time.time()) // 3600 != last_prune_hour:
+                last_prune_hour = int(time.time()) // 3600
+                try:
+                    await self.prune_stats()
+                    await self.purge_pending_games()
+                except Exception as e:
+                    logging.error(f"Pruning failed: {e}")
+    
+    async def reset_message_count(self, guild_id: int, user_id: int):
+        """Reset message count to 0"""
+        self._pending_messages.pop((guild_id, user_id), None)
+        self._message_counts.set((guild_id, user_id), 0)
+        await self._execute("""
+            INSERT INTO user_state (guild_id, user_id, message_count) VALUES (?, ?, 0)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET message_count = 0
+        """, (guild_id, user_id))
+    
+    async def get_message_leaderboard(self, guild_id: int, limit: int = 10, offset: int = 0):
+        """One page of (user_id, message_count), highest first"""
+        await self.flush_message_counts()
+        return await self._fetchall(
+            "SELECT user_id, message_count FROM user_state WHERE guild_id = ? AND message_count > 0 ORDER BY message_count DESC, user_id LIMIT ? OFFSET ?",
+            (guild_id, limit, offset)
+        )
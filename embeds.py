@@ -0,0 +1,80 @@
+import copy
+import discord
+
+# DISPLAY REWARDS (What players SEE)
+DISPLAY_REWARDS = {
+    "6 Tomatrio": "35%",
+    "2x Mango": "25%",
+    "2x 50-100k Damage (per 2 second)": "15%",
+    "3x Lucky Block": "12.5%",
+    "67": "7.5%",
+    "Owner Collection Payout": "4.5%",
+    "Secret Dragon Canneiloni (sab)": "0.5%"
+}
+
+# Built once: the rewards list never changes while the bot runs
+REWARDS_TEXT = "\n".join([f"• **{reward}** - {percent}" for reward, percent in DISPLAY_REWARDS.items()])
+
+def _template(title: str, color: discord.Color, how_to_play: str, footer: str = None) -> discord.Embed:
+    embed = discord.Embed(title=title, color=color)
+    embed.add_field(name="🎁 Possible Rewards", value=REWARDS_TEXT, inline=False)
+    embed.add_field(name="How to Play", value=how_to_play, inline=False)
+    if footer:
+        embed.set_footer(text=footer)
+    return embed
+
+TRICK_OR_TREAT_INVITE = _template(
+    "🎃 Trick or Treat Time!",
+    discord.Color.orange(),
+    "Press **Trick or Treat** to play or **Cancel** to skip."
+)
+
+FREEPLAY_INVITE = _template(
+    "🎁 Free Gift Time!",
+    discord.Color.gold(),
+    "Press **Play Freeplay** or **Cancel**.\n\n**Note:** You can only claim this once!",
+    footer="No points required!"
+)
+
+def _fill(template: discord.Embed, description: str) -> discord.Embed:
+    """Shallow copy of a template with its description set (fields are shared, don't add to them)"""
+    embed = copy.copy(template)
+    embed.description = description
+    return embed
+
+def trickortreat_invite(user: discord.abc.User, points: int) -> discord.Embed:
+    return _fill(
+        TRICK_OR_TREAT_INVITE,
+        f"{user.mention}, you've been invited to play!\n\n**Cost:** 1 point\n**Your points:** {points}"
+    )
+
+def freeplay_invite(user: discord.abc.User) -> discord.Embed:
+    return _fill(
+        FREEPLAY_INVITE,
+        f"{user.mention}, you've received a **FREE** Trick or Treat!\n\n⚠️ **This is a ONE-TIME offer!**"
+    )
+
+def reward_won(title: str, reward_name: str, color: discord.Color, footer: str, prefix: str = "You won") -> discord.Embed:
+    embed = discord.Embed(
+        title=title,
+        description=f"{prefix} the **{DISPLAY_REWARDS[reward_name]}** reward: **{reward_name}**!",
+        color=color
+    )
+    embed.set_footer(text=footer)
+    return embed
+
+def tricked(points: int) -> discord.Embed:
+    embed = discord.Embed(
+        title="👻 Oops...",
+        description="Sorry, you got **tricked**! So sorry for trick goodluck for next time!",
+        color=discord.Color.red()
+    )
+    embed.set_footer(text=f"Points remaining: {points}")
+    return embed
+
+def cancelled(description: str) -> discord.Embed:
+    return discord.Embed(
+        title="Cancelled",
+        description=description,
+        color=discord.Color.greyple()
+    )
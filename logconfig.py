@@ -0,0 +1,64 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_DIR = 'logs'
+
+# size: rotate at LOG_MAX_BYTES, time: rotate at midnight
+LOG_ROTATE = os.getenv('LOG_ROTATE', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+
+# Also write logs/statistics.jsonl (one JSON object per line)
+LOG_JSON = os.getenv('LOG_JSON', '0') == '1'
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }, ensure_ascii=False)
+
+def _file_handler(path: str) -> logging.Handler:
+    if LOG_ROTATE == 'time':
+        return logging.handlers.TimedRotatingFileHandler(path, when='midnight', backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    return logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Route all logging through a queue so file and console I/O happen on a background thread.
+
+    The event loop only pays for a queue put. Call .stop() on the returned listener at
+    shutdown to drain what's left.
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    
+    text_format = logging.Formatter('[%(asctime)s] %(message)s')
+    handlers = []
+    
+    file_handler = _file_handler(os.path.join(LOG_DIR, 'statistics.log'))
+    file_handler.setFormatter(text_format)
+    handlers.append(file_handler)
+    
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(text_format)
+    handlers.append(stream_handler)
+    
+    if LOG_JSON:
+        json_handler = _file_handler(os.path.join(LOG_DIR, 'statistics.jsonl'))
+        json_handler.setFormatter(JsonFormatter())
+        handlers.append(json_handler)
+    
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
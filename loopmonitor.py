@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from perf import recorder
+
+# How often the loop is sampled, and how much lateness counts as a stall worth a stack dump
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '0.1'))
+LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', '0.5'))
+
+class LoopMonitor:
+    """Samples event loop lag, and dumps the loop thread's stack while it's blocked.
+    
+    The sampler task can only measure a stall after it's over, so a watchdog thread
+    checks when the sampler last ran: once that is LOOP_STALL_THRESHOLD overdue, the
+    loop is still stuck inside some callback and its current stack shows which one.
+    """
+    
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_tick = time.monotonic()
+        self.max_lag = 0.0
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._loop_thread_id = None
+    
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._stop.set()
+    
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.last_tick = time.monotonic()
+            self.max_lag = max(self.max_lag, lag)
+            recorder.record("loop.lag", lag)
+            if lag > self.threshold:
+                recorder.incr("loop.stalls")
+                logging.warning(f"Event loop was blocked for {lag:.2f}s")
+    
+    def _watch(self):
+        dumped_for = None
+        while not self._stop.wait(self.interval):
+            tick = self.last_tick
+            if time.monotonic() - tick < self.threshold + self.interval or tick == dumped_for:
+                continue
+            # One dump per stall, taken while the offending code is still running
+            dumped_for = tick
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            logging.warning(f"Event loop blocked for over {self.threshold}s, loop thread is at:\n{stack}")
+
+# Started by the bot once its loop is running
+loop_monitor = LoopMonitor()
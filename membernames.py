@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+import discord
+from config import LEAN_MEMBER_CACHE
+
+# Display names looked up through the gateway are kept this long / up to this many
+NAME_CACHE_TTL = float(os.getenv('NAME_CACHE_TTL', '600'))
+NAME_CACHE_SIZE = int(os.getenv('NAME_CACHE_SIZE', '5000'))
+
+# Discord answers at most 100 user_ids per member request
+QUERY_BATCH = 100
+
+async def role_members(guild: discord.Guild, role: discord.Role) -> list:
+    """Members with a role, fetched once without caching them in lean mode (role.members would be empty)"""
+    if LEAN_MEMBER_CACHE:
+        return [member for member in await guild.chunk(cache=False) if member.get_role(role.id)]
+    return role.members
+
+class MemberNameCache:
+    """Display names for user IDs without keeping whole guilds in the member cache.
+    
+    Cached members are used first (a chunked guild has all of them); the rest come from
+    one gateway member request per 100 misses and are kept in a bounded LRU with a TTL. Users who left
+    are remembered as None so they aren't asked for again until the entry expires.
+    """
+    
+    def __init__(self, max_size: int = NAME_CACHE_SIZE, ttl: float = NAME_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._names = OrderedDict()  # (guild_id, user_id) -> (expires_at, display name or None)
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def _get(self, key, now: float):
+        entry = self._names.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] < now:
+            del self._names[key]
+            return False, None
+        self._names.move_to_end(key)
+        return True, entry[1]
+    
+    def _set(self, key, name, now: float):
+        self._names[key] = (now + self.ttl, name)
+        self._names.move_to_end(key)
+        if len(self._names) > self.max_size:
+            self._names.popitem(last=False)
+    
+    async def resolve(self, guild: discord.Guild, user_ids) -> dict:
+        """{user_id: display name or None (not in the guild / lookup failed)}"""
+        now = time.monotonic()
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            member = guild.get_member(user_id)
+            if member is not None:
+                names[user_id] = member.display_name
+                continue
+            if guild.chunked:
+                # Every member is cached, so this user left the guild
+                names[user_id] = None
+                continue
+            found, name = self._get((guild.id, user_id), now)
+            if found:
+                names[user_id] = name
+            else:
+                missing.append(user_id)
+        
+        for i in range(0, len(missing), QUERY_BATCH):
+            batch = missing[i:i + QUERY_BATCH]
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+            except (asyncio.TimeoutError, discord.ClientException) as e:
+                # Show the fallback this time, but don't remember it
+                logging.warning(f"Member lookup failed in guild {guild.id}: {e}")
+                names.update(dict.fromkeys(batch))
+                continue
+            
+            found = {member.id: member.display_name for member in members}
+            for user_id in batch:
+                names[user_id] = found.get(user_id)
+                self._set((guild.id, user_id), names[user_id], now)
+        return names
@@ -0,0 +1,91 @@
+import functools
+import inspect
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Discord invalidates an interaction token that wasn't answered within 3 seconds
+INTERACTION_DEADLINE = 3.0
+
+class PerfRecorder:
+    """Rolling latency windows per operation name, percentiles computed on demand"""
+    
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self.samples = {}  # name -> deque of the last `window` durations (seconds)
+        self.totals = {}  # name -> [count, sum] since start
+        self.counters = {}  # name -> count (errors, deadline misses, ...)
+    
+    def record(self, name: str, seconds: float):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.totals[name] = [0, 0.0]
+        samples.append(seconds)
+        totals = self.totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+    
+    def incr(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+    
+    def timed(self, name: str):
+        """Decorator timing every call of a coroutine function"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+    
+    def instrument(self, obj, prefix: str):
+        """Time every public coroutine method of obj as '<prefix>.<method>'"""
+        for attr in dir(obj):
+            if attr.startswith('_'):
+                continue
+            method = getattr(obj, attr)
+            if inspect.iscoroutinefunction(method):
+                setattr(obj, attr, self.timed(f"{prefix}.{attr}")(method))
+    
+    def percentiles(self, name: str):
+        """(count, p50, p95, p99, max) over the rolling window"""
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return 0, 0.0, 0.0, 0.0, 0.0
+        
+        def pick(q):
+            return samples[min(len(samples) - 1, int(q * len(samples)))]
+        return self.totals[name][0], pick(0.50), pick(0.95), pick(0.99), samples[-1]
+    
+    def summary(self):
+        """[(name, count, p50, p95, p99, max)] sorted by p95, slowest first"""
+        rows = [(name, *self.percentiles(name)) for name in self.samples]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+    
+    def prometheus_text(self, prefix: str = 'halloweenbot') -> str:
+        lines = [
+            f"# HELP {prefix}_latency_seconds Handler and query latency over the last {self.window} calls",
+            f"# TYPE {prefix}_latency_seconds summary",
+        ]
+        for name, count, p50, p95, p99, _ in self.summary():
+            for quantile, value in (("0.5", p50), ("0.95", p95), ("0.99", p99)):
+                lines.append(f'{prefix}_latency_seconds{{name="{name}",quantile="{quantile}"}} {value:.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{name="{name}"}} {count}')
+            lines.append(f'{prefix}_latency_seconds_sum{{name="{name}"}} {self.totals[name][1]:.6f}')
+        
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, count in sorted(self.counters.items()):
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+# Shared by bot.py, the cogs and Database
+recorder = PerfRecorder()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import time
+import discord
+from discord.ext import commands
+from perf import recorder
+
+def parse_rate(value: str):
+    """'5/10' -> (5 calls, per 10 seconds)"""
+    calls, _, seconds = value.partition('/')
+    return int(calls), float(seconds or 1)
+
+# Burst size and refill window per user, separately for every slash/prefix command and for buttons
+COMMAND_RATE = parse_rate(os.getenv('RATE_LIMIT_COMMANDS', '5/10'))
+BUTTON_RATE = parse_rate(os.getenv('RATE_LIMIT_BUTTONS', '4/5'))
+
+# message: tell the user once per limited stretch, then drop silently; silent: never answer
+RATE_LIMIT_RESPONSE = os.getenv('RATE_LIMIT_RESPONSE', 'message')
+RATE_LIMIT_MESSAGE = os.getenv('RATE_LIMIT_MESSAGE', "⏳ Slow down! Try again in {retry_after:.0f}s.")
+
+# How often idle buckets are swept out
+SWEEP_INTERVAL = 60.0
+
+class RateLimited(commands.CheckFailure):
+    """Raised by the prefix command check, ignored by on_command_error"""
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated', 'warned')
+    
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.warned = False
+
+class TokenBucketLimiter:
+    """Token bucket per key: `burst` calls at once, refilled at burst/per tokens a second.
+    
+    A bucket untouched for `per` seconds is full again, i.e. the same as no bucket,
+    so those are dropped every SWEEP_INTERVAL to keep memory bounded by active users.
+    """
+    
+    def __init__(self, burst: int, per: float):
+        self.burst = burst
+        self.per = per
+        self.rate = burst / per
+        self._buckets = {}
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+    
+    def __len__(self):
+        return len(self._buckets)
+    
+    def hit(self, key):
+        """Take a token: (0.0, False) if allowed, else (seconds until the next token, already warned)"""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.warned = False
+            return 0.0, False
+        
+        warned = bucket.warned
+        bucket.warned = True
+        return (1 - bucket.tokens) / self.rate, warned
+    
+    async def acquire(self, key):
+        """Wait for a token instead of being rejected (for the bot's own outgoing requests)"""
+        while True:
+            retry_after, _ = self.hit(key)
+            if not retry_after:
+                return
+            await asyncio.sleep(retry_after)
+    
+    def _sweep(self, now: float):
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket.updated < self.per}
+        self._next_sweep = now + SWEEP_INTERVAL
+
+command_limiter = TokenBucketLimiter(*COMMAND_RATE)
+button_limiter = TokenBucketLimiter(*BUTTON_RATE)
+
+def _rejection(retry_after: float, warned: bool):
+    """Message to send for a rejected call, None to drop it without a response"""
+    if warned or RATE_LIMIT_RESPONSE == 'silent':
+        return None
+    return RATE_LIMIT_MESSAGE.format(retry_after=max(1.0, retry_after))
+
+async def allow_interaction(interaction: discord.Interaction, limiter: TokenBucketLimiter, scope: str) -> bool:
+    """interaction_check for slash commands and buttons, answers a rejection at most once"""
+    retry_after, warned = limiter.hit((interaction.user.id, scope))
+    if not retry_after:
+        return True
+    
+    recorder.incr(f"ratelimited.{scope}")
+    message = _rejection(retry_after, warned)
+    if message:
+        try:
+            await interaction.response.send_message(message, ephemeral=True)
+        except (discord.errors.HTTPException, ConnectionError) as e:
+            logging.error(f"Failed to send rate limit message: {e}")
+    return False
+
+async def allow_command(ctx: commands.Context) -> bool:
+    """Global prefix command check"""
+    scope = ctx.command.qualified_name
+    retry_after, warned = command_limiter.hit((ctx.author.id, scope))
+    if not retry_after:
+        return True
+    
+    recorder.incr(f"ratelimited.{scope}")
+    message = _rejection(retry_after, warned)
+    if message:
+        try:
+            await ctx.send(message, delete_after=3)
+        except (discord.errors.HTTPException, ConnectionError) as e:
+            logging.error(f"Failed to send rate limit message: {e}")
+    raise RateLimited(message or "Rate limited")
@@ -0,0 +1,97 @@
+import asyncio
+import functools
+import logging
+import os
+import discord
+
+# Defer once a handler has used this much of Discord's 3 second budget without answering
+DEFER_AFTER = float(os.getenv('DEFER_AFTER', '1.5'))
+
+def _lock(interaction: discord.Interaction) -> asyncio.Lock:
+    """Per-interaction lock so an automatic defer never races the handler's own response"""
+    lock = interaction.extras.get('response_lock')
+    if lock is None:
+        lock = interaction.extras['response_lock'] = asyncio.Lock()
+    return lock
+
+def _remaining_budget(interaction: discord.Interaction) -> float:
+    # Clamp: clock skew between us and Discord must not push the defer past the deadline
+    age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    return min(DEFER_AFTER, max(0.0, DEFER_AFTER - age))
+
+async def _defer_later(interaction: discord.Interaction, delay: float, ephemeral: bool):
+    await asyncio.sleep(delay)
+    async with _lock(interaction):
+        if interaction.response.is_done():
+            return
+        try:
+            if interaction.type == discord.InteractionType.component:
+                # Acknowledge the button press, the message is edited afterwards
+                await interaction.response.defer()
+            else:
+                await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+                # The first followup replaces this message and inherits its visibility
+                interaction.extras['public_thinking'] = not ephemeral
+        except (discord.errors.HTTPException, ConnectionError) as e:
+            logging.error(f"Failed to defer interaction: {e}")
+
+def defer_when_slow(ephemeral: bool = False):
+    """Decorator for handlers taking (self, interaction, ...).
+
+    If the handler hasn't responded within DEFER_AFTER seconds of the interaction being
+    created, it is deferred automatically; send() and edit() below then go through
+    followups / the original response instead of the (expired) initial response.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, interaction: discord.Interaction, *args, **kwargs):
+            deferrer = asyncio.create_task(_defer_later(interaction, _remaining_budget(interaction), ephemeral))
+            try:
+                return await func(self, interaction, *args, **kwargs)
+            finally:
+                deferrer.cancel()
+        return wrapper
+    return decorator
+
+async def send(interaction: discord.Interaction, content: str = None, *, embed: discord.Embed = None, view: discord.ui.View = None, ephemeral: bool = False):
+    """Send a message as the initial response, or as a followup once responded/deferred"""
+    kwargs = {'ephemeral': ephemeral}
+    if embed:
+        kwargs['embed'] = embed
+    else:
+        kwargs['content'] = content
+    if view:
+        kwargs['view'] = view
+    
+    async with _lock(interaction):
+        try:
+            if not interaction.response.is_done():
+                await interaction.response.send_message(**kwargs)
+            elif interaction.extras.pop('public_thinking', False) and ephemeral:
+                # Replacing the public "thinking..." message would make this reply public too,
+                # so remove it and send the reply as a new (ephemeral) followup
+                await interaction.delete_original_response()
+                await interaction.followup.send(**kwargs)
+            else:
+                await interaction.followup.send(**kwargs)
+        except (discord.errors.HTTPException, ConnectionError) as e:
+            logging.error(f"Failed to send message: {e}")
+            try:
+                await interaction.followup.send(**kwargs)
+            except:
+                pass
+
+async def edit(interaction: discord.Interaction, *, embed: discord.Embed, view: discord.ui.View = None):
+    """Replace the component's message, through the original response once deferred"""
+    async with _lock(interaction):
+        try:
+            if not interaction.response.is_done():
+                await interaction.response.edit_message(embed=embed, view=view)
+            else:
+                await interaction.edit_original_response(embed=embed, view=view)
+        except (discord.errors.HTTPException, ConnectionError) as e:
+            logging.error(f"Failed to edit message: {e}")
+            try:
+                await interaction.followup.send(embed=embed)
+            except:
+                pass
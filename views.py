@@ -0,0 +1,119 @@
+import discord
+from perf import recorder
+import ratelimit
+import responses
+
+LEADERBOARD_PAGE_SIZE = 10
+
+# <prefix>:<action>:<user_id>:<game_id>[:<guild_id>], the guild is only added to invites sent by DM
+INVITE_TEMPLATE = r'{prefix}:(?P<action>play|cancel):(?P<user_id>\d+):(?P<game_id>\d+)(?::(?P<guild_id>\d+))?'
+
+def build_leaderboard_embed(title: str, rows, names: dict, page: int, unit: str) -> discord.Embed:
+    embed = discord.Embed(
+        title=title,
+        color=discord.Color.orange()
+    )
+    
+    for user_id, value in rows:
+        name = names.get(user_id) or f"User {user_id}"
+        embed.add_field(name=name, value=f"{value} {unit}", inline=False)
+    
+    embed.set_footer(text=f"Page {page + 1}")
+    return embed
+
+class InviteButton(discord.ui.DynamicItem[discord.ui.Button], template=INVITE_TEMPLATE.format(prefix='[a-z]+')):
+    """Persistent Play/Cancel button of a game invite, all state lives in custom_id and the pending_games table.
+    
+    Subclasses pass prefix, play_label and play_style and implement play_button and cancel_button.
+    Invites sent by DM carry their guild in custom_id (DM interactions have no guild_id).
+    """
+    
+    def __init_subclass__(cls, *, prefix: str, play_label: str, play_style: discord.ButtonStyle):
+        super().__init_subclass__(template=INVITE_TEMPLATE.format(prefix=prefix))
+        cls.prefix = prefix
+        cls.play_label = play_label
+        cls.play_style = play_style
+    
+    def __init__(self, action: str, user_id: int, game_id: int, guild_id: int = None):
+        custom_id = f"{self.prefix}:{action}:{user_id}:{game_id}" + (f":{guild_id}" if guild_id else "")
+        if action == "play":
+            button = discord.ui.Button(label=self.play_label, style=self.play_style, custom_id=custom_id)
+        else:
+            button = discord.ui.Button(label="Cancel", style=discord.ButtonStyle.secondary, custom_id=custom_id)
+        super().__init__(button)
+        self.action = action
+        self.user_id = user_id
+        self.game_id = game_id
+        self.guild_id = guild_id
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        guild_id = int(match['guild_id']) if match['guild_id'] else interaction.guild_id
+        return cls(match['action'], int(match['user_id']), int(match['game_id']), guild_id)
+    
+    @classmethod
+    def view(cls, user_id: int, game_id: int, guild_id: int = None) -> discord.ui.View:
+        """Buttons for an invite, pass guild_id when it is sent outside the guild"""
+        view = discord.ui.View(timeout=None)
+        view.add_item(cls("play", user_id, game_id, guild_id))
+        view.add_item(cls("cancel", user_id, game_id, guild_id))
+        return view
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Spammed presses are dropped before they touch the database
+        return await ratelimit.allow_interaction(interaction, ratelimit.button_limiter, self.prefix)
+    
+    async def callback(self, interaction: discord.Interaction):
+        if interaction.user.id != self.user_id:
+            await responses.send(interaction, "This isn't for you!", ephemeral=True)
+            return
+        
+        with recorder.timer(f"button.{self.prefix}.{self.action}"):
+            if self.action == "play":
+                await self.play_button(interaction)
+            else:
+                await self.cancel_button(interaction)
+
+class LeaderboardView(discord.ui.View):
+    """Prev/Next buttons for the user who opened a leaderboard.
+    
+    render(guild, page) -> (embed, has_next), embed is None when the page is empty.
+    """
+    
+    def __init__(self, render, owner: discord.abc.User, has_next: bool):
+        super().__init__(timeout=120)
+        self.render = render
+        self.owner = owner
+        self.page = 0
+        self.update_buttons(has_next)
+    
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await ratelimit.allow_interaction(interaction, ratelimit.button_limiter, "leaderboard")
+    
+    def update_buttons(self, has_next: bool):
+        self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = not has_next
+    
+    @recorder.timed("button.leaderboard")
+    async def show_page(self, interaction: discord.Interaction, page: int):
+        if interaction.user.id != self.owner.id:
+            await interaction.response.send_message("This isn't for you!", ephemeral=True)
+            return
+        
+        embed, has_next = await self.render(interaction.guild, page)
+        if embed is None:
+            await interaction.response.send_message("No more users on that page.", ephemeral=True)
+            return
+        
+        self.page = page
+        self.update_buttons(has_next)
+        
+        await responses.edit(interaction, embed=embed, view=self)
+    
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, max(0, self.page - 1))
+    
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.show_page(interaction, self.page + 1)